@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Compile each host's checks into a compact binary bundle holding
+the validated, normalized checks and their pre-rendered 'packet-tracer'
+commands. Bundles are keyed by the hash of the source vars file so they
+are recompiled automatically whenever that file changes.
+"""
+
+import hashlib
+import marshal
+import os
+from functools import lru_cache
+from importlib.util import MAGIC_NUMBER
+from narc import helpers
+from narc.helpers import find_vars, parse_vars, validate_checks, get_cmd
+
+# The marshal format may change between Python versions, so the header
+# includes the interpreter's bytecode magic number alongside our own
+MAGIC = b"NARCBNDL" + MAGIC_NUMBER
+
+# Integer fields that are normalized since they may be strings in the vars
+INT_KEYS = ["src_port", "dst_port", "icmp_type", "icmp_code"]
+
+
+def load_bundle(file_base, path="bundles"):
+    """
+    Returns a dictionary with the "checks" list for a host and the
+    corresponding "cmds" list from its bundle in the supplied directory.
+    The bundle header is compared against the hash of the vars file and of
+    the code that validates and renders the checks; if the bundle is
+    missing, stale, or corrupt, it is recompiled first.
+    If the checks are invalid, no bundle is written and "cmds" is None.
+    """
+    src = find_vars(file_base)
+    with open(src, "rb") as handle:
+        text = handle.read()
+    digest = hashlib.sha256(text).digest()
+
+    bundle = os.path.join(path, f"{os.path.basename(file_base)}.bin")
+    data = _read_bundle(bundle, digest)
+    if data is None:
+        data = compile_bundle(src, text, digest, bundle)
+    return data
+
+
+def compile_bundle(src, text, digest, bundle):
+    """
+    Parses and validates the checks from the text of the vars file at
+    path "src", then writes the bundle file (atomically, so concurrent
+    readers never see a partial bundle). Returns the same dictionary
+    as "load_bundle".
+    """
+    checks = parse_vars(src, text)
+    if validate_checks(checks):
+        if os.path.exists(bundle):
+            os.remove(bundle)
+        return {"checks": checks, "cmds": None}
+
+    checks = [_normalize(chk) for chk in checks]
+    data = {"checks": checks, "cmds": [get_cmd(chk) for chk in checks]}
+
+    os.makedirs(os.path.dirname(bundle) or ".", exist_ok=True)
+    with open(f"{bundle}.tmp", "wb") as handle:
+        handle.write(_header(digest) + marshal.dumps(data))
+    os.replace(f"{bundle}.tmp", bundle)
+    return data
+
+
+def _read_bundle(bundle, digest):
+    """
+    Returns the contents of the bundle if its header matches the current
+    code and source digest, otherwise returns None. A truncated or
+    corrupt bundle also returns None, so it is recompiled.
+    """
+    if not os.path.exists(bundle):
+        return None
+
+    header = _header(digest)
+    with open(bundle, "rb") as handle:
+        data = handle.read()
+    if not data.startswith(header):
+        return None
+
+    # Bundles are only ever written locally by "compile_bundle"
+    try:
+        with memoryview(data) as view:
+            return marshal.loads(view[len(header) :])  # nosec
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def _header(digest):
+    """
+    Returns the bundle header for the supplied source digest, which starts
+    with the magic number and the hash of the code (see "_code_digest").
+    """
+    return MAGIC + _code_digest() + digest
+
+
+@lru_cache(maxsize=None)
+def _code_digest():
+    """
+    Returns a hash of this module and of the helpers, so bundles are
+    recompiled whenever the validation rules, the command rendering, or
+    the normalization change, since bundled checks are never validated
+    again at runtime. Computed once per process.
+    """
+    code = hashlib.sha256()
+    for path in [helpers.__file__, __file__]:
+        with open(path, "rb") as handle:
+            code.update(handle.read())
+    return code.digest()
+
+
+def _normalize(chk):
+    """
+    Returns a copy of a (valid) check with consistent value types, so
+    consumers do not need to handle the variations allowed in vars files.
+    """
+    chk = dict(chk)
+    chk["should"] = chk["should"].lower()
+    for key in INT_KEYS:
+        if key in chk:
+            chk[key] = int(chk[key])
+    return chk
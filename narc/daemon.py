@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: A long-running daemon that keeps netmiko sessions to the
+inventory hosts warm and answers individual check requests, encoded
+as JSON Lines, over a Unix socket.
+"""
+
+import json
+import os
+import socketserver
+import threading
+import xmltodict
+from narc.tasks import run_check, keepalive
+
+
+class CheckHandler(socketserver.StreamRequestHandler):
+    """
+    Represents a single client connection. Each line received is a JSON
+    check dictionary with an extra "host" key, and each line sent back
+    is the JSON response for the corresponding request.
+    """
+
+    def handle(self):
+        """
+        Answer every request line until the client closes the socket.
+        """
+        for line in self.rfile:
+            if not line.strip():
+                continue
+
+            try:
+                chk = json.loads(line)
+            except json.decoder.JSONDecodeError as exc:
+                resp = {"reason": f"request is not valid JSON: {exc}"}
+            else:
+                resp = self.server.check(chk)
+
+            self.wfile.write(json.dumps(resp).encode() + b"\n")
+
+
+class CheckServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Represents the daemon itself. It owns the Nornir object, and hence the
+    open netmiko sessions, for its whole lifetime. A lock per host ensures
+    that only one request or keepalive uses a given session at a time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, nornir, args):
+        """
+        Constructor binds the Unix socket specified by the "daemon"
+        argument, replacing any stale socket file left behind.
+        """
+        if os.path.exists(args.daemon):
+            os.remove(args.daemon)
+        super().__init__(args.daemon, CheckHandler)
+        self.nornir = nornir
+        self.args = args
+        self.locks = {name: threading.Lock() for name in nornir.inventory.hosts}
+        self.stopped = threading.Event()
+
+    def check(self, chk):
+        """
+        Run a single check on the requested host and return a dictionary
+        with the parsed result, or with a failure "reason" instead.
+        """
+        if not isinstance(chk, dict):
+            return {"reason": "request must be a JSON object"}
+
+        host = chk.pop("host", None)
+        resp = {"host": host, "id": chk.get("id")}
+        if host not in self.locks:
+            resp["reason"] = "'host' key missing or not in inventory"
+            return resp
+
+        # Hosts that failed previously are retried since their session
+        # was dropped and will be re-established on demand
+        with self.locks[host]:
+            mresult = self.nornir.filter(name=host).run(
+                task=run_check, chk=chk, args=self.args, on_failed=True
+            )[host]
+
+        if mresult.failed:
+            resp["reason"] = "check execution failed; see nornir.log"
+        elif mresult[0].result:
+            resp["reason"] = mresult[0].result[0]["reason"]
+        else:
+            # Convert from XML to Python objects using a dummy topmost key
+            data = xmltodict.parse(f"<root>{mresult[1].result}</root>")["root"]
+            action = data["result"]["action"]
+            resp.update(
+                {
+                    "should": chk["should"],
+                    "action": action,
+                    "success": chk["should"].lower() == action.lower(),
+                    "result": data,
+                }
+            )
+        return resp
+
+    def keepalive(self):
+        """
+        Probe (and if needed, re-establish) the session to every host.
+        This also opens sessions to hosts that are not yet connected. Hosts
+        are handled concurrently, each holding its own lock only while its
+        session is probed.
+        """
+        self.nornir.run(task=keepalive, locks=self.locks, on_failed=True)
+
+    def keepalive_loop(self):
+        """
+        Run the keepalive repeatedly until the daemon stops.
+        """
+        while not self.stopped.wait(self.args.keepalive):
+            self.keepalive()
+
+
+def serve(nornir, args):
+    """
+    Warm up sessions to all inventory hosts, then answer check requests
+    on the Unix socket until interrupted. Dryruns have no sessions to
+    maintain, so the keepalive is skipped entirely.
+    """
+    server = CheckServer(nornir, args)
+    if not args.dryrun:
+        server.keepalive()
+        threading.Thread(target=server.keepalive_loop, daemon=True).start()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stopped.set()
+        server.server_close()
+        os.remove(args.daemon)
+        nornir.close_connections(on_good=True, on_failed=True)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Find identical flows that produce different outcomes on different
+hosts of the same role (such as HA pairs). Each flow and each outcome is
+normalized and hashed, then the results are indexed by role and flow, so
+divergences are found in a single pass rather than comparing every pair
+of hosts.
+"""
+
+import hashlib
+import ipaddress
+import json
+
+# Keys that identify a flow, in addition to "in_intf" and "proto", based
+# on the protocol (see "get_cmd"); other protocols use neither
+PROTO_KEYS = {
+    "tcp": ["src_port", "dst_port"],
+    "udp": ["src_port", "dst_port"],
+    "icmp": ["icmp_type", "icmp_code"],
+}
+
+
+def normalize_flow(chk):
+    """
+    Returns a dictionary identifying the flow simulated by a (valid) check,
+    independent of the check "id" and of the variations allowed in vars
+    files, such as integers given as strings or IPv6 address formatting.
+    Only the keys relevant to the protocol are included.
+    """
+    proto = str(chk["proto"]).lower()
+    flow = {
+        "context": chk.get("context"),
+        "in_intf": chk["in_intf"],
+        "proto": proto,
+        "src_ip": ipaddress.ip_address(chk["src_ip"]).compressed,
+        "dst_ip": ipaddress.ip_address(chk["dst_ip"]).compressed,
+    }
+    for key in PROTO_KEYS.get(proto, []):
+        flow[key] = int(chk[key])
+    return flow
+
+
+def normalize_outcome(data):
+    """
+    Returns a dictionary with the outcome of a check from its parsed
+    'packet-tracer' output: the final action, the drop reason (if any),
+    and the configuration of every ACCESS-LIST phase, in phase order.
+    """
+    # A lone phase is parsed as a dictionary rather than a list
+    phases = data.get("Phase") or []
+    if isinstance(phases, dict):
+        phases = [phases]
+
+    return {
+        "action": data["result"]["action"].lower(),
+        "drop_reason": data["result"].get("drop-reason"),
+        "acl": [
+            phase["config"]
+            for phase in phases
+            if phase.get("type") == "ACCESS-LIST" and phase.get("config")
+        ],
+    }
+
+
+def digest(obj):
+    """
+    Returns a short, stable hash of a normalized flow or outcome.
+    """
+    text = json.dumps(obj, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def find_divergences(entries):
+    """
+    Indexes an iterable of (role, flow hash, outcome hash, host, check id)
+    tuples by role and flow. Returns a list of (role, flow hash, outcomes)
+    tuples for each flow with more than one distinct outcome among hosts
+    of the same role, where "outcomes" maps each outcome hash to the list
+    of (host, check id) tuples that produced it. Runs in linear time.
+    """
+    index = {}
+    for role, flow, outcome, host, chk_id in entries:
+        outcomes = index.setdefault((role, flow), {})
+        outcomes.setdefault(outcome, []).append((host, chk_id))
+
+    return [
+        (role, flow, outcomes)
+        for (role, flow), outcomes in index.items()
+        if len(outcomes) > 1
+    ]
@@ -7,9 +7,10 @@ These cannot be fed directly into Nornir but can be referenced within
 those tasks.
 """
 
+import json
+import os
+import time
 from datetime import datetime
-from netaddr import IPAddress
-from netaddr.core import AddrFormatError
 
 
 def status(condition, task, msg):
@@ -23,6 +24,78 @@ def status(condition, task, msg):
         print(f"{task.host.name}@{time}: {msg}")
 
 
+def retry(func, retries, backoff, reset=None):
+    """
+    Call "func" and return a tuple of its result and the number of retries
+    needed. After each failure, call "reset" (if supplied) and retry up to
+    "retries" times, sleeping "backoff" seconds before the first retry and
+    doubling that time for each one after. Once all retries are exhausted,
+    the last exception is re-raised.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return (func(), attempt)
+        except Exception:  # pylint: disable=broad-except
+            if reset:
+                reset()
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+    # Unreachable, but keeps linters happy about the implicit return
+    return None
+
+
+def list_vars_hosts(path="host_vars"):
+    """
+    Returns a sorted list of host names that have a JSON or YAML
+    vars file in the given directory.
+    """
+    hosts = set()
+    for varfile in os.listdir(path):
+        base, ext = os.path.splitext(varfile)
+        if ext in [".json", ".yaml"]:
+            hosts.add(base)
+    return sorted(hosts)
+
+
+def find_vars(file_base):
+    """
+    Returns the path to the JSON (primary) or YAML (secondary) vars file,
+    using the same precedence as the main runbook. If neither is present,
+    raise a FileNotFoundError.
+    """
+    for ext in [".json", ".yaml"]:
+        if os.path.exists(f"{file_base}{ext}"):
+            return f"{file_base}{ext}"
+
+    raise FileNotFoundError(f"{file_base} json/yaml file missing")
+
+
+def parse_vars(path, text):
+    """
+    Parses the text of a JSON or YAML vars file, based on the file
+    extension in the path, and returns the "checks" list.
+    """
+    if path.endswith(".json"):
+        return json.loads(text)["checks"]
+
+    # pylint: disable=import-outside-toplevel
+    import yaml
+
+    return yaml.safe_load(text)["checks"]
+
+
+def load_vars(file_base):
+    """
+    Loads the "checks" list from a JSON (primary) or YAML (secondary)
+    vars file without Nornir. See "find_vars" for details.
+    """
+    path = find_vars(file_base)
+    with open(path, "r") as handle:
+        return parse_vars(path, handle.read())
+
+
 def validate_checks(checks):
     """
     Perform data validation on the 'checks' list. Returns a list of failed
@@ -31,6 +104,7 @@ def validate_checks(checks):
 
     fail_list = []
     unique_id_set = set()
+    id_count = 0
     for chk in checks:
 
         # Validate various fields for correctness
@@ -39,6 +113,10 @@ def validate_checks(checks):
 
         # The 'id' is known good; add to a set
         unique_id_set.add(chk["id"])
+        id_count += 1
+
+        if not validate_context(chk, fail_list):
+            continue
 
         if not validate_in_intf(chk, fail_list):
             continue
@@ -62,8 +140,9 @@ def validate_checks(checks):
             if not validate_icmp(chk, fail_list):
                 continue
 
-    # Finally, ensure there are no duplicate IDs
-    if len(unique_id_set) < len(checks):
+    # Finally, ensure there are no duplicate IDs. Checks without an 'id'
+    # were already reported, so they are not counted as duplicates
+    if len(unique_id_set) < id_count:
         _fail_check(checks[0], fail_list, "found duplicate id; review all checks")
 
     # Return list of all failures; empty list means success
@@ -82,6 +161,23 @@ def validate_id(chk, fail_list):
     return True
 
 
+def validate_context(chk, fail_list):
+    """
+    Ensure the optional "context" key in the "check" dictionary is valid
+    when present. Must be a non-empty string without whitespace, since it
+    is used in the "changeto context" command on multi-context ASAs.
+    Return False if any condition is not satisfied
+    and also append the check to the fail_list with a fail reason.
+    """
+    if not "context" in chk:
+        return True
+    ctx = chk["context"]
+    if not isinstance(ctx, str) or not ctx or len(ctx.split()) != 1:
+        _fail_check(chk, fail_list, "'context' must be a string without spaces")
+        return False
+    return True
+
+
 def validate_in_intf(chk, fail_list):
     """
     Ensure the "in_intf" key in the "check" dictionary is present
@@ -101,6 +197,11 @@ def validate_ip(chk, fail_list):
     both source and dest IPs. Return False if any condition is not satisfied
     and also append the check to the fail_list with a fail reason.
     """
+    # Deferred import; netaddr is only needed once validation starts
+    # pylint: disable=import-outside-toplevel
+    from netaddr import IPAddress
+    from netaddr.core import AddrFormatError
+
     ip_list = []
     for ip_key in ["src_ip", "dst_ip"]:
         if not ip_key in chk:
@@ -218,6 +319,36 @@ def _fail_check(chk, fail_list, reason):
     fail_list.append(chk)
 
 
+def group_by_context(checks):
+    """
+    Returns the indices of the checks ordered so that checks in the same
+    ASA security context run consecutively, with the checks that have no
+    "context" key first. The original order is kept within each group.
+    """
+    return sorted(range(len(checks)), key=lambda i: checks[i].get("context", ""))
+
+
+def changeto(conn, host, context):
+    """
+    Switch the netmiko session to the given ASA security context, unless
+    it is already there. The current context is tracked on the session
+    itself, so a new session (which starts in the login context) always
+    switches first. A context of None means the login context, which is
+    named by the "login_context" host data (default "admin"), since a
+    multi-context session logs into the admin context. Raises a ValueError
+    if the ASA rejects the command.
+    """
+    if getattr(conn, "narc_context", None) == context:
+        return
+
+    # Netmiko updates its base prompt after each "changeto" command
+    name = context if context is not None else host.get("login_context", "admin")
+    output = conn.send_command(f"changeto context {name}")
+    if "ERROR" in output:
+        raise ValueError(f"changeto context {name} failed: {output.strip()}")
+    conn.narc_context = context
+
+
 def get_cmd(chk):
     """
     Assemble the correct "packet-tracer" command based on the "proto"
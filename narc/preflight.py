@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Load and validate every host_vars file before running any checks,
+using a pool of processes since parsing and validation are CPU-bound.
+Results are cached by the hash of each file so that unchanged files are
+skipped on the next preflight.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from narc import helpers
+from narc.helpers import find_vars, list_vars_hosts, parse_vars, validate_checks
+
+# Below this many files to check, starting the process pool costs more
+# than it saves, so the files are checked serially instead
+MIN_PARALLEL = 32
+
+
+def preflight(path="host_vars", cache="bundles/preflight.json", workers=None):
+    """
+    Loads and validates the vars file (JSON or YAML, using the same
+    precedence as the main runbook) for every host in the supplied
+    directory. Returns a dictionary mapping each host with at least one
+    invalid check to its list of failures, each with an "id" (if any) and
+    a "reason". Files that cannot be parsed are reported as one failure.
+    When "cache" is not None, files whose hash matches the previous result
+    are not checked again. "workers" limits the number of processes.
+    """
+    new, todo = _hash_files(path, _read_cache(cache))
+
+    # Check the new or changed files, in parallel if there are many
+    if todo:
+        srcs, texts = zip(*todo)
+        if len(todo) < MIN_PARALLEL:
+            fails = map(check_file, srcs, texts)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunk = max(1, len(todo) // (4 * (workers or os.cpu_count() or 1)))
+                fails = list(pool.map(check_file, srcs, texts, chunksize=chunk))
+        for src, fail_checks in zip(srcs, fails):
+            new[src]["fails"] = fail_checks
+
+    if cache is not None:
+        _write_cache(cache, new)
+    return {v["host"]: v["fails"] for v in new.values() if v["fails"]}
+
+
+def _hash_files(path, old):
+    """
+    Reads and hashes the vars file for every host in the directory. Returns
+    a tuple of the results for every file, keyed by path, reusing the "old"
+    cached result of each unchanged file, and a list of (path, text) tuples
+    for the new or changed files, which still need to be checked.
+    """
+    new = {}
+    todo = []
+    for host in list_vars_hosts(path):
+        src = find_vars(os.path.join(path, host))
+        with open(src, "rb") as handle:
+            text = handle.read()
+        digest = hashlib.sha256(text).hexdigest()
+
+        # Reuse the previous result if the file is unchanged
+        if old.get(src, {}).get("digest") == digest:
+            new[src] = old[src]
+        else:
+            new[src] = {"host": host, "digest": digest}
+            todo.append((src, text))
+    return (new, todo)
+
+
+def check_file(src, text):
+    """
+    Parses and validates the checks from the text of the vars file at
+    path "src" (runs in a worker process). Returns the list of failures,
+    trimmed to the "id" and "reason" keys to keep the cache small. Files
+    that cannot be parsed, or whose "checks" are not a list of dictionaries,
+    are reported as one failure.
+    """
+    try:
+        checks = parse_vars(src, text)
+        if not isinstance(checks, list) or not all(
+            isinstance(chk, dict) for chk in checks
+        ):
+            raise TypeError("'checks' must be a list of dictionaries")
+        fail_checks = validate_checks(checks)
+    except Exception as exc:  # pylint: disable=broad-except
+        return [{"reason": f"cannot load {src}: {type(exc).__name__}: {exc}"}]
+
+    fails = []
+    for chk in fail_checks:
+        fail = {"reason": chk["reason"]}
+        if chk.get("id"):
+            fail["id"] = str(chk["id"])
+        fails.append(fail)
+    return fails
+
+
+def _version():
+    """
+    Returns a hash of the validation code, so that cached results are
+    discarded whenever the validation rules change.
+    """
+    with open(helpers.__file__, "rb") as handle:
+        return hashlib.sha256(handle.read()).hexdigest()
+
+
+def _read_cache(cache):
+    """
+    Returns the cached results, keyed by vars file path, or an empty
+    dictionary if there is no usable cache.
+    """
+    if cache is None or not os.path.exists(cache):
+        return {}
+    try:
+        with open(cache, "r") as handle:
+            data = json.load(handle)
+    except ValueError:
+        return {}
+    return data["files"] if data.get("version") == _version() else {}
+
+
+def _write_cache(cache, files):
+    """
+    Writes the results to the cache file (atomically, so an interrupted
+    preflight never leaves a partial cache).
+    """
+    os.makedirs(os.path.dirname(cache) or ".", exist_ok=True)
+    with open(f"{cache}.tmp", "w") as handle:
+        json.dump({"version": _version(), "files": files}, handle)
+    os.replace(f"{cache}.tmp", cache)
@@ -9,3 +9,4 @@ to simplify access individual processor classes.
 from narc.processors.proc_terse import ProcTerse
 from narc.processors.proc_csv import ProcCSV
 from narc.processors.proc_json import ProcJSON
+from narc.processors.proc_diff import ProcDiff
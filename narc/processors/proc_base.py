@@ -6,6 +6,9 @@ Purpose: An abstract base class for other processors.
 """
 
 import os
+import tempfile
+from urllib.parse import quote
+import xmltodict
 
 
 class ProcBase:
@@ -13,8 +16,27 @@ class ProcBase:
     Represents an abstract processor object. Serves as a parent
     class for concrete processors to handle different output styles.
     Defines stub methods to reduce copy/paste burden on children.
+    Each check is processed as soon as it completes and its formatted
+    result is appended to a spool file for its host, so memory usage does
+    not grow with the size of the results. Only the location of each
+    result is kept, in a dictionary keyed by host and then by check id.
     """
 
+    def __init__(self):
+        """
+        Constructor initializes an empty dictionary to hold the locations
+        of the formatted results, along with the open spool files and the
+        temporary directory holding them. The directory is shared by all
+        hosts, which run concurrently, so it is created here rather than on
+        first use. Processors that
+        need every result, even with the "failonly" option, can clear the
+        "failonly" attribute.
+        """
+        self.rows = {}
+        self.handles = {}
+        self.spool = tempfile.TemporaryDirectory(prefix="narc-")
+        self.failonly = True
+
     def task_started(self, task):
         """
         Runs when a task begins.
@@ -39,9 +61,20 @@ class ProcBase:
     def task_instance_completed(self, task, host, mresult):
         """
         Runs when an individual host finishes running a task and
-        provides access to the host-specific MultiResult.
+        provides access to the host-specific MultiResult. Closes the
+        host's spool file and sorts the host's results in the same order
+        as its checks. If the checks could not be loaded (failed host),
+        any previous results are kept as they are.
         """
-        pass
+        # pylint: disable=unused-argument
+        handle = self.handles.pop(host.name, None)
+        if handle is not None:
+            handle.close()
+
+        if len(mresult) < 2 or mresult[1].failed:
+            return
+        checks = mresult[1].result["checks"]
+        self.rows[host.name] = sort_rows(self.rows.get(host.name, {}), checks)
 
     def subtask_instance_started(self, task, host):
         """
@@ -52,6 +85,77 @@ class ProcBase:
     def subtask_instance_completed(self, task, host, mresult):
         """
         Runs when subtasks finish running for a given host and
-        provides access to the host-specific MultiResult.
+        provides access to the host-specific MultiResult. Subtasks that
+        simulate a check are processed right away, so the raw output
+        is no longer needed once this returns.
+        """
+        chk = task.params.get("chk")
+        if chk is None or mresult.failed:
+            return
+
+        # Convert from XML to Python objects, using a dummy topmost key
+        # in case the output contains multiple top-level elements
+        data = xmltodict.parse(f"<root>{mresult[0].result}</root>")["root"]
+        data["retries"] = getattr(mresult[0], "retries", 0)
+        action = data["result"]["action"]
+        success = chk["should"].lower() == action.lower()
+
+        # Also remove results from a previous run that are now filtered out
+        rows = self.rows.setdefault(host.name, {})
+        failonly = self.failonly and task.parent_task.params["args"].failonly
+        if failonly and success:
+            rows.pop(chk["id"], None)
+        else:
+            # pylint: disable=assignment-from-no-return
+            row = self.format_check(host, chk, data, success)
+            rows[chk["id"]] = self.store(host.name, row)
+
+    def format_check(self, host, chk, data, success):
+        """
+        Runs when a check completes on a given host and returns its
+        result, formatted for the specific output style.
         """
         pass
+
+    def store(self, name, row):
+        """
+        Appends a formatted row (string) to the spool file of the named host,
+        releasing it from memory right away, and returns its location in the
+        file. Each host has its own spool file and its checks run in sequence,
+        so no lock is needed.
+        """
+        handle = self.handles.get(name)
+        if handle is None:
+            path = os.path.join(self.spool.name, quote(name, safe=""))
+            handle = self.handles[name] = open(path, "ab")
+
+        data = row.encode()
+        offset = handle.tell()
+        handle.write(data)
+        return (offset, len(data))
+
+    def read_rows(self, name):
+        """
+        Yields the formatted rows for the named host, in order, reading them
+        back from its spool file one at a time.
+        """
+        rows = self.rows.get(name)
+        if not rows:
+            return
+
+        with open(
+            os.path.join(self.spool.name, quote(name, safe="")), "rb"
+        ) as handle:
+            for offset, length in rows.values():
+                handle.seek(offset)
+                yield handle.read(length).decode()
+
+
+def sort_rows(rows, checks):
+    """
+    Returns a new dictionary with the processed rows (keyed by check id)
+    sorted in the same order as the checks. Rows whose checks no longer
+    exist are dropped, which keeps outputs accurate when processors
+    handle several runs over time (watch mode).
+    """
+    return {chk["id"]: rows[chk["id"]] for chk in checks if chk.get("id") in rows}
@@ -6,7 +6,6 @@ Purpose: A concrete processor that stores the packet-tracer
 results in CSV format.
 """
 
-import xmltodict
 from narc.processors.proc_base import ProcBase
 
 
@@ -19,11 +18,12 @@ class ProcCSV(ProcBase):
     def __init__(self):
         """
         Constructor defines a string containing column headers
-        to hold the results.
+        in addition to the dictionary that holds the rows.
         """
-        self.text = (
+        super().__init__()
+        self.header = (
             "host,id,proto,icmp type,icmp code,src_ip,src_port,dst_ip,"
-            "dst_port,in_intf,out_intf,action,drop_reason,success\n"
+            "dst_port,in_intf,out_intf,action,drop_reason,success,retries,context\n"
         )
 
     def task_completed(self, task, aresult):
@@ -33,51 +33,42 @@ class ProcCSV(ProcBase):
         """
         super().task_completed(task, aresult)
         with open("outputs/result.csv", "w") as handle:
-            handle.write(self.text)
+            handle.write(self.header)
+            for name in self.rows:
+                handle.writelines(self.read_rows(name))
 
-    def task_instance_completed(self, task, host, mresult):
+    def format_check(self, host, chk, data, success):
         """
-        When each host finishes running the task, assemble
-        the CSV rows based on the results, and append them to
-        the text string for use later.
+        When each check completes, assemble the CSV row based
+        on the result.
         """
-        checks = mresult[1].result["checks"]
-        failonly = task.params["args"].failonly
+        proto = str(chk["proto"]).lower()
+        text = f"{host.name},{chk['id']},{chk['proto']},"
 
-        # Iterate over the list of checks (input) and the corresponding
-        # netmiko results (output)
-        for chk, output in zip(checks, mresult[2:]):
-            # Convert from XML to Python objects, using the device
-            # hostname as the topmost key
-            data = xmltodict.parse(f"<root>{output.result}</root>")
-            action = data["root"]["result"]["action"]
-            success = chk["should"].lower() == action.lower()
+        # Check for TCP or UDP
+        if proto in ["tcp", "udp"]:
+            text += (
+                f",,{chk['src_ip']},{chk['src_port']},"
+                f"{chk['dst_ip']},{chk['dst_port']},"
+            )
 
-            if (not failonly) or (failonly and not success):
-                proto = str(chk["proto"]).lower()
-                self.text += f"{host.name},{chk['id']},{chk['proto']},"
+        # Check for ICMP
+        elif proto == "icmp":
+            text += (
+                f"{chk['icmp_type']},{chk['icmp_code']},"
+                f"{chk['src_ip']},,{chk['dst_ip']},,"
+            )
 
-                # Check for TCP or UDP
-                if proto in ["tcp", "udp"]:
-                    self.text += (
-                        f",,{chk['src_ip']},{chk['src_port']},"
-                        f"{chk['dst_ip']},{chk['dst_port']},"
-                    )
+        # Protocol is an uncommon protocol specified numerically
+        else:
+            text += f",,{chk['src_ip']},,{chk['dst_ip']},,"
 
-                # Check for ICMP
-                elif proto == "icmp":
-                    self.text += (
-                        f"{chk['icmp_type']},{chk['icmp_code']},"
-                        f"{chk['src_ip']},,{chk['dst_ip']},,"
-                    )
-
-                # Protocol is an uncommon protocol specified numerically
-                else:
-                    self.text += f",,{chk['src_ip']},,{chk['dst_ip']},,"
-
-                # Finish the text by adding the drop reason (optional)
-                # and ingress/egress interfaces, which are protocol-agnostic
-                in_intf = data["root"]["result"].get("input-interface", "")
-                out_intf = data["root"]["result"].get("output-interface", "")
-                reason = data["root"]["result"].get("drop-reason", "")
-                self.text += f"{in_intf},{out_intf},{action},{reason},{success}\n"
+        # Finish the text by adding the drop reason (optional), retries,
+        # ingress/egress interfaces, and context (optional, for multi-context
+        # ASAs), which are protocol-agnostic
+        in_intf = data["result"].get("input-interface", "")
+        out_intf = data["result"].get("output-interface", "")
+        action = data["result"]["action"]
+        reason = data["result"].get("drop-reason", "")
+        text += f"{in_intf},{out_intf},{action},{reason},{success},"
+        return text + f"{data['retries']},{chk.get('context', '')}\n"
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: A concrete processor that compares the packet-tracer
+results across hosts and stores the divergences in JSON format.
+"""
+
+import json
+from narc.divergence import digest, find_divergences
+from narc.divergence import normalize_flow, normalize_outcome
+from narc.processors.proc_base import ProcBase
+
+
+class ProcDiff(ProcBase):
+    """
+    Represents a processor object, inheriting from ProcBase,
+    for the fleet-wide divergence report. Hosts are compared with other
+    hosts of the same "role" (from the Nornir host data, via inheritance).
+    Hosts without a role are all compared with one another.
+    """
+
+    def __init__(self):
+        """
+        Constructor defines dictionaries holding a single copy of each
+        distinct flow and outcome, keyed by hash, in addition to the
+        dictionary that holds the rows. Every result is needed to find
+        divergences, so the "failonly" filter does not apply.
+        """
+        super().__init__()
+        self.failonly = False
+        self.flows = {}
+        self.outcomes = {}
+
+    def task_completed(self, task, aresult):
+        """
+        After the task is completed for all hosts, index the results
+        by role and flow, then write the divergences to an output file.
+        """
+        super().task_completed(task, aresult)
+        entries = (
+            (*row[:3], host, row[3])
+            for host, rows in self.rows.items()
+            for row in rows.values()
+            if row is not None
+        )
+
+        report = [
+            {
+                "role": role,
+                "flow": self.flows[flow],
+                "outcomes": [
+                    {
+                        **self.outcomes[outcome],
+                        "checks": [{"host": h, "id": i} for h, i in checks],
+                    }
+                    for outcome, checks in outcomes.items()
+                ],
+            }
+            for role, flow, outcomes in find_divergences(entries)
+        ]
+        report.sort(key=lambda div: json.dumps([div["role"], div["flow"]]))
+        with open("outputs/divergence.json", "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    def store(self, name, row):
+        """
+        Keeps the row (a few hashes, or None) in memory rather than in a
+        spool file, since every row is needed to index the results.
+        """
+        # pylint: disable=unused-argument
+        return row
+
+    def format_check(self, host, chk, data, success):
+        """
+        When each check completes, hash its flow and outcome, keeping only
+        the hashes for the row. Checks that could not be completed (ERROR)
+        are not a verdict from the device, so they are never compared.
+        """
+        # pylint: disable=unused-argument
+        if data["result"]["action"] == "ERROR":
+            return None
+
+        flow = normalize_flow(chk)
+        outcome = normalize_outcome(data)
+        flow_hash = digest(flow)
+        outcome_hash = digest(outcome)
+        self.flows.setdefault(flow_hash, flow)
+        self.outcomes.setdefault(outcome_hash, outcome)
+        return (host.get("role"), flow_hash, outcome_hash, chk["id"])
@@ -7,7 +7,6 @@ results in JSON format.
 """
 
 import json
-import xmltodict
 from narc.processors.proc_base import ProcBase
 
 
@@ -17,54 +16,40 @@ class ProcJSON(ProcBase):
     for the JSON format.
     """
 
-    def __init__(self):
-        """
-        Constructor initializes an empty dictionary to hold
-        the results.
-        """
-        self.data = {}
-
     def task_completed(self, task, aresult):
         """
         After the task is completed for all hosts, write the JSON
-        data to an output file.
+        data to an output file. Each result is already serialized, so
+        stream the enclosing host dictionaries by hand using the same
+        layout as json.dump() with an indent of 2. If there are no
+        entries for a host, the host is omitted entirely.
         """
         super().task_completed(task, aresult)
+        sep = "{\n"
         with open("outputs/result.json", "w") as handle:
-            json.dump(self.data, handle, indent=2)
-
-    def task_instance_started(self, task, host):
-        """
-        When each host begins running the task, create an empty
-        dictionary for that host that holds individual results.
-        """
-        self.data[host.name] = {}
-
-    def task_instance_completed(self, task, host, mresult):
-        """
-        When each host finishes running the task, assemble
-        the JSON dictionaries based on the results, and update
-        the main data dictionary for use later.
-        """
-        checks = mresult[1].result["checks"]
-        failonly = task.params["args"].failonly
-
-        # Iterate over the list of checks (input) and the corresponding
-        # netmiko results (output)
-        for chk, output in zip(checks, mresult[2:]):
-
-            # Convert from XML to Python objects, using the check id
-            # hostname as the topmost key. Use a dummy key in case the
-            # check id has spaces (which should be honored)
-            jdata = xmltodict.parse(f"<dummy>{output.result}</dummy>")
-
-            # Replace dummy key with ID (can contain spaces)
-            jdata[chk["id"]] = jdata.pop("dummy")
-            action = jdata[chk["id"]]["result"]["action"]
-            success = chk["should"].lower() == action.lower()
-            if (not failonly) or (failonly and not success):
-                self.data[host.name].update(jdata)
-
-        # If there are no entries for this host, delete the hostname key
-        if len(self.data[host.name]) == 0:
-            self.data.pop(host.name)
+            for host, rows in self.rows.items():
+                if not rows:
+                    continue
+
+                # Stream each host's results from its spool file
+                handle.write(f"{sep}  {json.dumps(host)}: {{\n")
+                for i, (chk_id, row) in enumerate(zip(rows, self.read_rows(host))):
+                    comma = ",\n" if i else ""
+                    handle.write(f"{comma}    {json.dumps(chk_id)}: {row}")
+                handle.write("\n  }")
+                sep = ",\n"
+
+            # Close the outer dictionary, or write an empty one if no hosts
+            handle.write("{}" if sep == "{\n" else "\n}")
+
+    def format_check(self, host, chk, data, success):
+        """
+        When each check completes, serialize the complete result right
+        away (indented for its final position in the output file) so that
+        it can be written to the spool file. Checks in a
+        multi-context ASA are attributed to their context.
+        """
+        # pylint: disable=unused-argument
+        if "context" in chk:
+            data = {"context": chk["context"], **data}
+        return json.dumps(data, indent=2).replace("\n", "\n    ")
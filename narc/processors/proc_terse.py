@@ -6,7 +6,6 @@ Purpose: A concrete processor that stores the packet-tracer
 results in a terse, text-based format.
 """
 
-import xmltodict
 from narc.processors.proc_base import ProcBase
 
 
@@ -16,13 +15,6 @@ class ProcTerse(ProcBase):
     for the terse, text-based format.
     """
 
-    def __init__(self):
-        """
-        Constructor initializes an empty string to hold
-        the results.
-        """
-        self.text = ""
-
     def task_completed(self, task, aresult):
         """
         After the task is completed for all hosts, write the text
@@ -30,27 +22,20 @@ class ProcTerse(ProcBase):
         """
         super().task_completed(task, aresult)
         with open("outputs/result.txt", "w") as handle:
-            handle.write(self.text)
+            for name in self.rows:
+                handle.writelines(self.read_rows(name))
 
-    def task_instance_completed(self, task, host, mresult):
+    def format_check(self, host, chk, data, success):
         """
-        When each host finishes running the task, assemble
-        the text output based on the results, and append them to
-        the text string for use later.
+        When each check completes, assemble the text output based
+        on the result.
         """
-        checks = mresult[1].result["checks"]
-        failonly = task.params["args"].failonly
-
-        # Iterate over the list of checks (input) and the corresponding
-        # netmiko results (output)
-        for chk, output in zip(checks, mresult[2:]):
-            # Convert from XML to Python objects, using the device
-            # hostname as the topmost key
-            data = xmltodict.parse(f"<root>{output.result}</root>")
-            action = data["root"]["result"]["action"]
-            success = chk["should"].lower() == action.lower()
-
-            if (not failonly) or (failonly and not success):
-                status = "PASS" if success else "FAIL"
-                output = f"{host.name[:12]:<12} {chk['id'][:24]:<24} -> {status}"
-                self.text += output + "\n"
+        # pylint: disable=unused-argument
+        status = "PASS" if success else "FAIL"
+
+        # Checks in a multi-context ASA add their context as a last column,
+        # keeping the other columns aligned with rows that have no context
+        text = f"{host.name[:12]:<12} {chk['id'][:24]:<24} -> {status}"
+        if "context" in chk:
+            text += f" {chk['context']}"
+        return text + "\n"
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Optional Python-side profiling (cProfile) and memory tracing
+(tracemalloc) scoped to the individual stages of a run. When profiling
+is disabled, entering a stage costs a single global lookup.
+"""
+
+import contextlib
+import cProfile
+import os
+import time
+import tracemalloc
+
+# Profiling state, populated only once "enable" is called
+ENABLED = False
+PROFILES = {}
+STATS = {}
+STACK = []
+NULL_STAGE = contextlib.nullcontext()
+
+
+def enable():
+    """
+    Enable profiling for all subsequent stages and start tracing memory
+    allocations. Note that cProfile only observes the calling thread, so
+    stages should run serially (one Nornir worker) while profiling.
+    """
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = True
+    tracemalloc.start()
+
+
+def stage(name):
+    """
+    Returns a context manager that profiles the enclosed code as the named
+    stage, or a no-op context manager if profiling is disabled.
+    """
+    if not ENABLED:
+        return NULL_STAGE
+    return _profile_stage(name)
+
+
+@contextlib.contextmanager
+def _profile_stage(name):
+    """
+    Profile the enclosed code, accumulating results across every use of
+    the stage. Profiles are exclusive: a nested stage pauses the profiler
+    of the enclosing stage. The wall time and net memory allocated, which
+    are also recorded, include any nested stages.
+    """
+    prof = PROFILES.setdefault(name, cProfile.Profile())
+    if STACK:
+        STACK[-1].disable()
+    STACK.append(prof)
+
+    start_time = time.perf_counter()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        calls, secs, mem = STATS.get(name, (0, 0.0, 0))
+        STATS[name] = (
+            calls + 1,
+            secs + time.perf_counter() - start_time,
+            mem + tracemalloc.get_traced_memory()[0] - start_mem,
+        )
+        STACK.pop()
+        if STACK:
+            STACK[-1].enable()
+
+
+def dump(path="outputs", top=25):
+    """
+    Write one cProfile dump per stage, named "profile_{stage}.prof", plus
+    a "profile_summary.txt" file with per-stage totals and the "top"
+    memory allocation sites. Dumps are sortable using "python -m pstats".
+    """
+    if not ENABLED:
+        return
+
+    os.makedirs(path, exist_ok=True)
+    for name, prof in PROFILES.items():
+        prof.dump_stats(os.path.join(path, f"profile_{name}.prof"))
+
+    snapshot = tracemalloc.take_snapshot()
+    with open(os.path.join(path, "profile_summary.txt"), "w") as handle:
+        handle.write(f"{'stage':<40} {'calls':>8} {'seconds':>10} {'net KiB':>10}\n")
+        for name, (calls, secs, mem) in sorted(
+            STATS.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            handle.write(
+                f"{name:<40} {calls:>8} {secs:>10.3f} {mem / 1024:>10.1f}\n"
+            )
+
+        handle.write(f"\nTop {top} allocation sites still in use\n")
+        for stat in snapshot.statistics("lineno")[:top]:
+            handle.write(f"{stat}\n")
+
+
+class StageProcessor:
+    """
+    Represents a wrapper around a Nornir processor that runs each of its
+    hooks as a profiled stage named "{processor class}.{hook}".
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, proc):
+        """
+        Constructor stores the processor being wrapped.
+        """
+        self.proc = proc
+
+    def __getattr__(self, name):
+        """
+        Returns the wrapped processor's hook, profiled as a stage.
+        """
+        hook = getattr(self.proc, name)
+        label = f"{type(self.proc).__name__}.{name}"
+
+        def _hook(*args, **kwargs):
+            with stage(label):
+                return hook(*args, **kwargs)
+
+        return _hook
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: A fleet-wide scheduler that executes individual checks using a
+shared pool of device sessions, rather than one thread per host, so that
+hosts with many checks do not dictate the total completion time.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from narc.helpers import retry
+
+
+class Scheduler:
+    """
+    Represents a pool of workers, one per session in the global connection
+    budget. Checks are queued per host. Each worker keeps a single session
+    and runs checks from its current host until that queue is drained,
+    then steals work from the longest remaining queue, subject to the
+    session limits of each host (see "HostQueues").
+    """
+
+    def __init__(self, budget, connect, execute, **kwargs):
+        """
+        Constructor starts "budget" worker threads. The "connect(host)"
+        callable returns a new session to a host, and "execute(session,
+        host, *params)" returns the output of a single check, using the
+        parameters supplied when the check was submitted. Opening a session
+        and failed checks are retried (see "retry" for details) using the
+        optional "retries" and "backoff" keyword arguments. If a session to
+        a host cannot be opened, all of its checks fail without trying to
+        connect again (see "HostDown"). Hosts without "max_sessions" data
+        use the optional "max_sessions" (default 1).
+        """
+        self.connect = connect
+        self.execute = execute
+        self.retry = partial(
+            retry, retries=kwargs.get("retries", 0), backoff=kwargs.get("backoff", 0)
+        )
+        self.hosts = HostQueues(kwargs.get("max_sessions", 1))
+        self.closed = False
+        self.cond = threading.Condition()
+        self.workers = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(budget)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, host, *params):
+        """
+        Queue a check for the given host and return a Future that resolves
+        to a tuple of the output of that check and the retries needed.
+        """
+        future = Future()
+        with self.cond:
+            if host.name in self.hosts.down:
+                future.set_exception(self.hosts.down[host.name])
+            else:
+                self.hosts.queue(host).append((params, future))
+                self.cond.notify_all()
+        return future
+
+    def close(self):
+        """
+        Let the workers exit once all queued checks are complete, then wait
+        for them to close their sessions.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        for worker in self.workers:
+            worker.join()
+
+    def _work(self):
+        """
+        Worker thread main loop. Holds at most one session at a time.
+        """
+        name, session = None, None
+        while True:
+            item = self._next(name)
+            if item is None:
+                break
+
+            # The reservation for the old host (if any) was already moved,
+            # so just close the old session when switching hosts
+            if item[0] != name:
+                self._disconnect(session)
+                name, session = item[0], None
+            if name is None:
+                continue
+
+            host = self.hosts.hosts[name]
+            params, future = item[1]
+
+            # Open the session (with retries) before running any check, so
+            # that an unreachable host fails once rather than per check
+            if session is None:
+                try:
+                    session = self.retry(partial(self.connect, host))[0]
+                except Exception as exc:  # pylint: disable=broad-except
+                    self._fail_host(name, future, exc)
+                    continue
+
+            def _attempt():
+                nonlocal session
+                if session is None:
+                    session = self.connect(host)
+                return self.execute(session, host, *params)
+
+            def _reset():
+                # The session may be broken; drop it and reconnect next time
+                nonlocal session
+                self._disconnect(session)
+                session = None
+
+            try:
+                future.set_result(self.retry(_attempt, reset=_reset))
+            except Exception as exc:  # pylint: disable=broad-except
+                future.set_exception(exc)
+
+        # Workers only exit after releasing their host (see "_next")
+        self._disconnect(session)
+
+    def _next(self, name):
+        """
+        Returns a tuple (hostname, (params, future)) for the next check to run,
+        preferring the host of the current session ("name") to avoid a new
+        login. Otherwise picks the longest queue that has spare session
+        capacity and moves the worker's reservation to it. If there is no
+        work, returns (None, None) so the worker closes its idle session
+        (freeing capacity), or None if the scheduler is closed and all
+        queues are empty.
+        """
+        with self.cond:
+            while True:
+                queues = self.hosts.queues
+                if name is not None and queues.get(name):
+                    return (name, queues[name].popleft())
+
+                # The current host is drained, so steal from the longest queue
+                # that can accept another session
+                target = self.hosts.longest(name)
+                if name is not None:
+                    self.hosts.adjust(name, -1)
+                    self.cond.notify_all()
+                    if target is None:
+                        return (None, None)
+
+                if target is not None:
+                    self.hosts.adjust(target, 1)
+                    return (target, queues[target].popleft())
+
+                if self.closed and not any(queues.values()):
+                    return None
+                self.cond.wait()
+
+    def _fail_host(self, name, future, exc):
+        """
+        Fail the current check with the exception raised when opening a
+        session to its host. Every check queued for the host, and every later
+        check submitted for it, fails with a HostDown exception instead,
+        since it never ran.
+        """
+        future.set_exception(exc)
+        with self.cond:
+            down = self.hosts.down[name] = HostDown(f"{type(exc).__name__}: {exc}")
+            futures = [item[1] for item in self.hosts.queues[name]]
+            self.hosts.queues[name].clear()
+        for item in futures:
+            item.set_exception(down)
+
+    @staticmethod
+    def _disconnect(session):
+        """
+        Close a worker's session, if any (dryruns have no sessions).
+        """
+        if session is not None:
+            session.disconnect()
+
+
+class HostDown(Exception):
+    """
+    Raised for a check that never ran because a session to its host could
+    not be opened for an earlier check. The message is the original error.
+    """
+
+
+class HostQueues:
+    """
+    Represents the queue of checks for each host along with the number of
+    open sessions, which are subject to these limits:
+      * "max_sessions": max concurrent sessions per host
+      * "mgmt_net_budget": max concurrent sessions across all hosts sharing
+        the same "mgmt_net" value (default unlimited)
+    These limits are read from the Nornir host data (via inheritance).
+    Hosts that could not be reached are kept in "down" along with the
+    HostDown exception for their remaining checks. Callers must hold the
+    scheduler's lock.
+    """
+
+    def __init__(self, max_sessions):
+        """
+        Constructor stores the "max_sessions" default for hosts without
+        their own value.
+        """
+        self.max_sessions = max_sessions
+        self.queues = {}
+        self.hosts = {}
+        self.down = {}
+        self.open = {}
+        self.net_open = {}
+        self.net_budgets = {}
+
+    def queue(self, host):
+        """
+        Returns the queue for a host, adding the host on first use.
+        """
+        if host.name not in self.queues:
+            self.queues[host.name] = deque()
+            self.hosts[host.name] = host
+            self.open[host.name] = 0
+            net = host.get("mgmt_net")
+            budget = host.get("mgmt_net_budget")
+            if net is not None and budget is not None:
+                old = self.net_budgets.get(net, budget)
+                self.net_budgets[net] = min(old, budget)
+        return self.queues[host.name]
+
+    def longest(self, name):
+        """
+        Returns the name of the host with the longest queue that can accept
+        another session, or None if there is no such host.
+        """
+        target = None
+        for cand, queue in self.queues.items():
+            if queue and self.has_capacity(cand, name):
+                if target is None or len(queue) > len(self.queues[target]):
+                    target = cand
+        return target
+
+    def has_capacity(self, cand, name):
+        """
+        Returns True if a new session to host "cand" fits within its
+        session limits, accounting for the session to host "name" that
+        the worker would close before switching.
+        """
+        host = self.hosts[cand]
+        if self.open[cand] >= host.get("max_sessions", self.max_sessions):
+            return False
+
+        net = host.get("mgmt_net")
+        if net is None or net not in self.net_budgets:
+            return True
+
+        net_open = self.net_open.get(net, 0)
+        if name is not None and self.hosts[name].get("mgmt_net") == net:
+            net_open -= 1
+        return net_open < self.net_budgets[net]
+
+    def adjust(self, name, delta):
+        """
+        Adjust the open session counts for a host and its network.
+        """
+        self.open[name] += delta
+        net = self.hosts[name].get("mgmt_net")
+        if net is not None:
+            self.net_open[net] = self.net_open.get(net, 0) + delta
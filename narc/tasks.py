@@ -6,67 +6,347 @@ Purpose: Define custom Nornir tasks for use with the main runbook.
 """
 
 import os
-from nornir.plugins.tasks.networking import netmiko_send_command
+from collections import deque
+from html import escape
+from nornir.core.task import Result
+from nornir.plugins.connections.netmiko import Netmiko
 from nornir.plugins.tasks.data import load_json, load_yaml
-from narc.helpers import validate_checks, get_cmd, status
+from narc.bundle import load_bundle
+from narc.helpers import validate_checks, get_cmd, retry, status
+from narc.helpers import changeto, group_by_context
+from narc.profiler import stage
+from narc.scheduler import HostDown, Scheduler
 
 
-def run_checks(task, args):
+def run_checks(task, args, only=None, scheduler=None):
     """
     Loads in host-specific variables, assembles proper 'packet-tracer'
     commands, issues them to the Cisco ASAs via netmiko, and record results.
     Returns a list of strings containing each command issued in sequence.
+    The optional 'only' dictionary maps hostnames to a set of check IDs
+    (or None for all checks) and, when supplied, restricts execution to
+    those checks (watch mode).
+    The optional 'scheduler' runs the checks using its shared pool of
+    sessions instead of the host's own netmiko session.
     """
 
-    # Load the checks for each inventory host
-    checks = _load_checks(task, args)
+    # Load and validate the checks. If any fail, quit early and return them
+    checks, cmds = _prepare_checks(task, args)
+    if cmds is None:
+        return checks
 
-    # Validate the checks. If any fail, quit early and return the failures
-    fail_checks = validate_checks(checks)
-    if len(fail_checks) > 0:
-        return fail_checks
+    # Issue only the requested checks, if specified, after validating all
+    ids = only.get(task.host.name, set()) if only is not None else None
+    checks, cmds = _select_checks(checks, cmds, ids)
+
+    # With a scheduler, queue all checks up front so that the shared pool
+    # of sessions can run them; the results are collected below in order
+    if scheduler is not None:
+        futures = deque(
+            scheduler.submit(task.host, chk, cmd) for chk, cmd in zip(checks, cmds)
+        )
 
-    # Iterate over the user-supplied checks
-    total = len(checks)
-    for i, chk in enumerate(checks):
+    # Iterate over the user-supplied checks. Once a host cannot be reached,
+    # its remaining checks are reported without trying to log in again
+    context, down = None, None
+    for i, (chk, cmd) in enumerate(zip(checks, cmds)):
+
+        # Print a status message when moving on to the next context
+        if chk.get("context") != context:
+            context = chk.get("context")
+            status(args.status, task, f"starting  checks in context {context}")
 
         # Store the current item and print a starting status message
         item = chk["id"]
-        status(args.status, task, f"starting  check {item} ({i+1}/{total})")
-
-        # If dryrun, use the mock task (regression testing only)
-        if args.dryrun:
-            task.run(task=_mock_packet_trace, chk=chk)
-
-        # Else, it's a live run, assemble the packet-tracer command
-        # and send to the ASA using netmiko. If the individual host
-        # has defined Netmiko minor options, include them
-        else:
-            cmd = get_cmd(chk)
-            task.run(
-                task=netmiko_send_command,
-                command_string=cmd,
-                expect_string=task.host.get("netmiko_expect_string"),
-                delay_factor=task.host.get("netmiko_delay_factor", 1),
-            )
+        status(args.status, task, f"starting  check {item} ({i+1}/{len(checks)})")
+
+        # If dryrun, use the mock task (regression testing only). Else,
+        # it's a live run, so issue the packet-tracer command to the ASA.
+        # Naming the subtask after the check lets processors match them up
+        with stage("dispatch"):
+            if scheduler is not None:
+                task.run(
+                    task=_scheduled_trace,
+                    name=item,
+                    chk=chk,
+                    future=futures.popleft(),
+                )
+            else:
+                # The result notes if the host is down (see "_packet_trace")
+                result = task.run(
+                    task=_get_trace_task(args),
+                    name=item,
+                    chk=chk,
+                    cmd=cmd,
+                    down=down,
+                )[0]
+                down = getattr(result, "down", down)
+
+        # The processors handle each output as soon as its subtask completes,
+        # so optionally release it right away to keep memory usage constant
+        if args.lowmem:
+            task.results.pop()
 
         # Print a completed status message
-        status(args.status, task, f"completed check {item} ({i+1}/{total})")
+        status(args.status, task, f"completed check {item} ({i+1}/{len(checks)})")
 
     # Nornir handles this by default, but being explicit makes logic easier
     return None
 
 
+def run_check(task, chk, args):
+    """
+    Validates and issues a single check over the host's long-lived netmiko
+    session, as used by the daemon. Returns a list of failed checks (empty
+    list means success) just like 'run_checks'.
+    """
+
+    # Validate the lone check. If it fails, quit early and return the failure
+    fail_checks = validate_checks([chk])
+    if len(fail_checks) > 0:
+        return fail_checks
+
+    # Failed attempts already drop the session, so the next check reconnects
+    item = chk["id"]
+    status(args.status, task, f"starting  check {item}")
+    task.run(task=_get_trace_task(args), chk=chk, cmd=get_cmd(chk))
+    status(args.status, task, f"completed check {item}")
+    return []
+
+
+def keepalive(task, locks):
+    """
+    Ensures the host has a usable netmiko session. A session whose SSH
+    channel has dropped is closed and re-established, and a host without
+    a session gets a new one, keeping every session warm for later checks.
+    The host's lock from the 'locks' dictionary is held throughout, so that
+    no check uses the session at the same time. If the session cannot be
+    opened, the host fails this probe and is tried again on the next one.
+    """
+    with locks[task.host.name]:
+        connections = task.host.connections
+        if "netmiko" in connections:
+            if not connections["netmiko"].connection.is_alive():
+                task.host.close_connection("netmiko")
+        try:
+            task.host.get_connection("netmiko", task.nornir.config)
+        except Exception:
+            # Nornir keeps the connection plugin even if it failed to open,
+            # so drop it to open a new session on the next probe
+            connections.pop("netmiko", None)
+            raise
+
+
+def get_scheduler(nornir, args):
+    """
+    Returns a Scheduler limited to 'args.sessions' concurrent sessions
+    overall and 'args.max_sessions' per host, unless the host data sets
+    its own 'max_sessions'. Its sessions are opened separately from the
+    ones managed by Nornir (which allows only one per host). Failed checks
+    are retried on a new session. Dryruns open no sessions and use the
+    mock output.
+    """
+    if args.dryrun:
+        return Scheduler(
+            args.sessions,
+            connect=lambda host: None,
+            execute=lambda session, host, chk, cmd: _mock_output(host, chk),
+            max_sessions=args.max_sessions,
+        )
+
+    return Scheduler(
+        args.sessions,
+        connect=lambda host: _open_session(host, nornir.config),
+        execute=lambda session, host, chk, cmd: _send_check(
+            session, host, cmd, chk.get("context")
+        ),
+        retries=args.retries,
+        backoff=args.backoff,
+        max_sessions=args.max_sessions,
+    )
+
+
+def _open_session(host, config):
+    """
+    Opens a new netmiko session to the host using the same parameters
+    as Nornir's netmiko connection plugin.
+    """
+    params = host.get_connection_parameters("netmiko")
+    plugin = Netmiko()
+    plugin.open(
+        hostname=params.hostname,
+        username=params.username,
+        password=params.password,
+        port=params.port,
+        platform=params.platform,
+        extras=params.extras,
+        configuration=config,
+    )
+    return plugin.connection
+
+
+def _scheduled_trace(task, chk, future):
+    """
+    Waits for the scheduler to run the check and returns its output,
+    or an error output if all attempts failed. Checks that never ran
+    because their host is down record 0 retries. The check itself is kept
+    as a parameter for consistency with the other trace tasks.
+    """
+    # pylint: disable=unused-argument
+    try:
+        output, retries = future.result()
+    except HostDown as exc:
+        output, retries = _error_output(exc), 0
+    except Exception as exc:  # pylint: disable=broad-except
+        output, retries = _error_output(exc), task.parent_task.params["args"].retries
+
+    return _trace_result(task.host, output, retries)
+
+
+def _get_trace_task(args):
+    """
+    Returns the task used to simulate a check: the mock task for dryruns
+    (regression testing only), otherwise the live packet-tracer task.
+    """
+    return _mock_packet_trace if args.dryrun else _packet_trace
+
+
+def _packet_trace(task, chk, cmd, down=None):
+    """
+    Sends the proper 'packet-tracer' command for the check to the ASA
+    using the host's netmiko session, which is opened on first use and then
+    reused, after switching to the check's context (if any).
+    Opening the session is retried with exponential backoff; if the host
+    still cannot be reached, an error output is returned and the result's
+    "down" attribute holds a HostDown exception. Passing it as "down" for
+    the remaining checks returns their error output (with 0 retries, as
+    they never ran) without trying to log in again, like the scheduler.
+    Failed checks on an open session are retried over a new session. If
+    every attempt fails, an error output is returned for this check only.
+    """
+    args = task.parent_task.params["args"]
+    if down is not None:
+        return _trace_result(task.host, _error_output(down), 0)
+
+    def _connect():
+        try:
+            return task.host.get_connection("netmiko", task.nornir.config)
+        except Exception:
+            # Nornir keeps the connection plugin even if it failed to open,
+            # so drop it to open a new session on the next attempt
+            task.host.connections.pop("netmiko", None)
+            raise
+
+    def _send():
+        return _send_check(_connect(), task.host, cmd, chk.get("context"))
+
+    def _reset():
+        if "netmiko" in task.host.connections:
+            task.host.close_connection("netmiko")
+
+    try:
+        retry(_connect, args.retries, args.backoff)
+    except Exception as exc:  # pylint: disable=broad-except
+        result = _trace_result(task.host, _error_output(exc), args.retries)
+        result.down = HostDown(f"{type(exc).__name__}: {exc}")
+        return result
+
+    try:
+        output, retries = retry(_send, args.retries, args.backoff, _reset)
+    except Exception as exc:  # pylint: disable=broad-except
+        output, retries = _error_output(exc), args.retries
+
+    return _trace_result(task.host, output, retries)
+
+
+def _send_check(conn, host, cmd, context=None):
+    """
+    Sends a 'packet-tracer' command over the supplied netmiko session and
+    returns the raw XML output, first switching to the ASA security context
+    if needed (see "changeto"). If the individual host has defined Netmiko
+    minor options, include them. Raises a ValueError if the output is
+    truncated, in which case the session should not be reused.
+    """
+    changeto(conn, host, context)
+    output = conn.send_command(
+        cmd,
+        expect_string=host.get("netmiko_expect_string"),
+        delay_factor=host.get("netmiko_delay_factor", 1),
+    )
+    if "</result>" not in output:
+        raise ValueError("truncated XML output; missing </result>")
+    return output
+
+
+def _error_output(exc):
+    """
+    Returns XML mimicking 'packet-tracer' output for a check that could not
+    be completed, with an action of ERROR and the exception as the reason.
+    """
+    reason = escape(f"{type(exc).__name__}: {exc}", quote=False)
+    return (
+        f"<result><action>ERROR</action><drop-reason>{reason}</drop-reason></result>"
+    )
+
+
+def _trace_result(host, output, retries):
+    """
+    Returns a Result containing the check output, also recording how
+    many retries were needed for the processors.
+    """
+    result = Result(host=host, result=output)
+    result.retries = retries
+    return result
+
+
+def _prepare_checks(task, args):
+    """
+    Loads the checks for the host (see "_load_checks") and validates them,
+    unless they come from a (previously validated) bundle. Returns a tuple
+    of the checks and their commands. If any check is invalid, returns a
+    tuple of the failed checks and None instead.
+    """
+    with stage("load_checks"):
+        checks, cmds = _load_checks(task, args)
+
+    if cmds is None:
+        with stage("validate_checks"):
+            fail_checks = validate_checks(checks)
+        if len(fail_checks) > 0:
+            return (fail_checks, None)
+        with stage("get_cmd"):
+            cmds = [get_cmd(chk) for chk in checks]
+    return (checks, cmds)
+
+
+def _select_checks(checks, cmds, ids=None):
+    """
+    Returns a tuple of the checks and their commands to issue, restricted to
+    the check IDs in the set "ids" (unless None). The checks are grouped by
+    ASA security context so that each session only issues "changeto context"
+    once per group; the processors restore the original order.
+    """
+    keep = [
+        i for i in group_by_context(checks) if ids is None or checks[i]["id"] in ids
+    ]
+    return ([checks[i] for i in keep], [cmds[i] for i in keep])
+
+
 def _load_checks(task, args):
     """
     Loads in host-specific variables from JSON (primary) or YAML
-    (secondary) files from the 'host_vars/' directory.
+    (secondary) files from the 'host_vars/' directory, or from the
+    host's compiled bundle when requested. Returns a tuple of the checks
+    and their commands, which is None unless loaded from a bundle.
     """
 
     # Attempt to variables from JSON first, then YAML.
     # If neither are present, raise a FileNotFoundError
     file_base = f"host_vars/{task.host.name}"
-    if os.path.exists(f"{file_base}.json"):
+    if args.bundle:
+        status(args.status, task, "loading bundled vars")
+        check_result = task.run(task=_load_bundle, file_base=file_base)
+    elif os.path.exists(f"{file_base}.json"):
         status(args.status, task, "loading JSON vars")
         check_result = task.run(task=load_json, file=f"{file_base}.json")
     elif os.path.exists(f"{file_base}.yaml"):
@@ -78,15 +358,34 @@ def _load_checks(task, args):
 
     # Extract the "checks" list from inside the Result/MR objects
     status(args.status, task, "loading vars succeeded")
-    return check_result[0].result["checks"]
+    data = check_result[0].result
+    return (data["checks"], data.get("cmds"))
+
+
+def _load_bundle(task, file_base):
+    """
+    Loads the checks and commands from the host's compiled bundle,
+    (re)compiling it first if the vars file has changed.
+    """
+    # pylint: disable=unused-argument
+    return load_bundle(file_base)
 
 
-def _mock_packet_trace(task, chk):
+def _mock_packet_trace(task, chk, cmd, down=None):
     """
     Simulates output from a Cisco ASA "packet-tracer" command using XML
     format for local testing. The "result" for all phases, as well as
     the final result, will be set equal to the check["should"] value.
     """
+    # pylint: disable=unused-argument
+    return _mock_output(task.host, chk)
+
+
+def _mock_output(host, chk):
+    """
+    Returns the mock XML output for a check on the given host. See
+    "_mock_packet_trace" for details.
+    """
 
     # Create XML text and substitute "should" for actual result
     result = chk["should"].upper()
@@ -105,7 +404,7 @@ def _mock_packet_trace(task, chk):
         <subtype></subtype>
         <result>{result}</result>
         <config>Implicit Rule</config>
-        <extra>{task.host.name}</extra>
+        <extra>{host.name}</extra>
         </Phase>
         <result>
         <input-interface>UNKNOWN</input-interface>
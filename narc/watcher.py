@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Monitor the inventory and host_vars files for changes and
+determine which checks on which hosts must be re-executed.
+"""
+
+import os
+import time
+from narc.helpers import list_vars_hosts, load_vars
+
+# inotify is optional (Linux only); fall back to polling when unavailable
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+INVENTORY_FILES = ["hosts.yaml", "groups.yaml"]
+
+
+def diff_checks(old, new):
+    """
+    Compare two 'checks' lists for the same host. Returns the set of check
+    IDs that are new or modified in the 'new' list, or None when the lists
+    differ in a way that requires re-running every check (missing or
+    duplicate IDs, for example). An empty set means no check needs to run,
+    although deleted checks may still need to be pruned from the outputs.
+    """
+    old_by_id = {chk.get("id"): chk for chk in old}
+    new_by_id = {chk.get("id"): chk for chk in new}
+    if len(new_by_id) != len(new) or None in new_by_id:
+        return None
+
+    return {cid for cid, chk in new_by_id.items() if old_by_id.get(cid) != chk}
+
+
+class Watcher:
+    """
+    Represents the state of the watched files. Each call to 'wait' blocks
+    until at least one relevant file changes and then reports what changed
+    relative to the previous call.
+    """
+
+    def __init__(self, path="host_vars", interval=1.0):
+        """
+        Constructor records the initial file state and checks. It uses
+        inotify when available, otherwise polls every 'interval' seconds.
+        """
+        self.path = path
+        self.interval = interval
+        self.stamps = self._get_stamps()
+        self.checks = {host: self._load(host) for host in list_vars_hosts(path)}
+        self.inotify = None
+        if INotify is not None:
+            mask = flags.CLOSE_WRITE | flags.CREATE | flags.DELETE | flags.MOVED_TO
+            self.inotify = INotify()
+            self.inotify.add_watch(path, mask)
+            self.inotify.add_watch(".", mask)
+
+    def wait(self):
+        """
+        Block until a file changes. Returns a tuple (inventory, only) where
+        "inventory" is True if an inventory file changed, meaning all checks
+        on all hosts must be re-executed. Otherwise, "only" maps each affected
+        hostname to the set of check IDs that must be re-executed.
+        """
+        while True:
+            if self.inotify is not None:
+                # Short read delay coalesces bursts of events from editors
+                self.inotify.read(read_delay=100)
+            else:
+                time.sleep(self.interval)
+
+            stamps = self._get_stamps()
+            changed = {
+                f
+                for f in stamps.keys() | self.stamps.keys()
+                if stamps.get(f) != self.stamps.get(f)
+            }
+            self.stamps = stamps
+            if changed:
+                break
+
+        if any(f in INVENTORY_FILES for f in changed):
+            self.checks = {h: self._load(h) for h in list_vars_hosts(self.path)}
+            return (True, None)
+
+        only = {}
+        hosts = {os.path.splitext(os.path.basename(f))[0] for f in changed}
+        for host in hosts:
+            old = self.checks.get(host) or []
+            new = self._load(host)
+            if new is None or new == old:
+                continue
+
+            # Even if no check needs to run (deleted or reordered checks),
+            # the host still runs so the processors can update the outputs
+            ids = diff_checks(old, new)
+            only[host] = ids if ids is not None else {c.get("id") for c in new}
+            self.checks[host] = new
+
+        return (False, only)
+
+    def close(self):
+        """
+        Stop watching the files, releasing the inotify descriptor (if any).
+        """
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def _get_stamps(self):
+        """
+        Returns a dictionary mapping each watched file to a tuple of its
+        modification time and size, which is cheap to compare.
+        """
+        files = [f for f in INVENTORY_FILES if os.path.exists(f)]
+        files += [
+            os.path.join(self.path, f)
+            for f in os.listdir(self.path)
+            if f.endswith((".json", ".yaml"))
+        ]
+        stamps = {}
+        for varfile in files:
+            stat = os.stat(varfile)
+            stamps[varfile] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _load(self, host):
+        """
+        Load the checks for a host, returning None if its vars file was
+        deleted or cannot be parsed (often a file that is only partially
+        saved). Invalid checks are caught later by the normal validation
+        process.
+        """
+        try:
+            return load_vars(os.path.join(self.path, host))
+        except FileNotFoundError:
+            return None
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"{host} error: cannot load vars: {exc}")
+            return None
@@ -7,9 +7,9 @@ Purpose: Main entrypoint for narc program.
 
 import argparse
 import sys
-from nornir import InitNornir
-from narc.tasks import run_checks
-from narc.processors import ProcTerse, ProcCSV, ProcJSON
+
+# Heavier imports (Nornir, netmiko, xmltodict, etc.) are deferred into the
+# functions that need them to keep CLI startup fast for quick invocations
 
 
 def main(args):
@@ -17,27 +17,242 @@ def main(args):
     Execution begins here.
     """
 
+    # Without profiling, run directly so there is no overhead at all
+    if not args.profile:
+        _main(args)
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from narc import profiler
+
+    profiler.enable()
+    try:
+        with profiler.stage("main"):
+            _main(args)
+    finally:
+        profiler.dump("outputs")
+
+
+def _main(args):
+    """
+    Run the program in the mode selected by the CLI args.
+    """
+
+    # Validate host_vars offline without paying for Nornir initialization
+    if args.validate_only or args.preflight:
+        if _validate_only(args.preflight):
+            sys.exit(1)
+        return
+
+    # Compile host_vars into bundles offline, also without Nornir
+    if args.compile:
+        if _compile():
+            sys.exit(1)
+        return
+
     # Initialize nornir using default configuration settings
-    init_nornir = InitNornir()
-    nornir = init_nornir.with_processors([ProcTerse(), ProcCSV(), ProcJSON()])
+    init_nornir = _init_nornir(args)
 
-    # Execute the "run_checks" task to get started, passing in CLI args
-    aresult = nornir.run(task=run_checks, args=args)
+    # In daemon mode, keep sessions open and answer requests until stopped
+    if args.daemon:
+        from narc.daemon import serve  # pylint: disable=import-outside-toplevel
 
-    # Handle failed checks by printing them out and exiting with rc=1
-    failed = False
-    for host, mresult in aresult.items():
-        if mresult[0].result:
-            print(f"{host} error: at least one check is invalid")
-            for chk in mresult[0].result:
-                name = chk.get("id", "no_id")
-                print(f"{host[:12]:<12} {name[:24]:<24} -> {chk['reason']}")
-            failed = True
-
-    if failed:
+        serve(init_nornir, args)
+        return
+
+    # In watch mode, keep sessions open and re-run checks as files change
+    if args.watch:
+        _watch(init_nornir, args)
+        return
+
+    # Execute the checks and if any are invalid, exit with rc=1
+    if _run(_with_processors(init_nornir), args):
         sys.exit(1)
 
 
+def _init_nornir(args):
+    """
+    Initialize nornir using default configuration settings. When profiling,
+    hosts run serially since cProfile only observes the calling thread.
+    """
+    # pylint: disable=import-outside-toplevel
+    from nornir import InitNornir
+    from narc.profiler import stage
+
+    with stage("nornir_init"):
+        if args.profile:
+            return InitNornir(core={"num_workers": 1})
+        return InitNornir()
+
+
+def _with_processors(init_nornir):
+    """
+    Returns a copy of the Nornir object with a new set of processors,
+    which handle the output files. When profiling, each processor hook
+    is profiled as a separate stage.
+    """
+    # pylint: disable=import-outside-toplevel
+    from narc import profiler
+    from narc.processors import ProcTerse, ProcCSV, ProcJSON, ProcDiff
+
+    procs = [ProcTerse(), ProcCSV(), ProcJSON(), ProcDiff()]
+    if profiler.ENABLED:
+        procs = [profiler.StageProcessor(proc) for proc in procs]
+    return init_nornir.with_processors(procs)
+
+
+def _run(nornir, args, only=None):
+    """
+    Execute the "run_checks" task, passing in CLI args and optionally
+    the specific checks to run (see "run_checks"). Handle failed checks by
+    printing them out. Returns the set of hosts that failed or have at
+    least one invalid check, none of whose checks were run.
+    """
+    # pylint: disable=import-outside-toplevel
+    from narc.tasks import run_checks, get_scheduler
+
+    # With a session budget, checks run on a shared pool of sessions. Each
+    # Nornir thread queues the checks of one host and awaits their results,
+    # so one thread per session keeps every session busy without starting
+    # a thread for every host in the inventory. When profiling, hosts still
+    # run serially (see "_init_nornir")
+    scheduler, num_workers = None, None
+    if args.sessions:
+        scheduler = get_scheduler(nornir, args)
+        num_workers = None if args.profile else args.sessions
+
+    # Hosts that failed in a previous watch mode run are included as well
+    try:
+        aresult = nornir.run(
+            task=run_checks,
+            args=args,
+            only=only,
+            scheduler=scheduler,
+            num_workers=num_workers,
+            on_failed=True,
+        )
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+
+    failed = set()
+    for host, mresult in aresult.items():
+        if mresult.failed:
+            _print_error(host, mresult)
+            failed.add(host)
+        elif _print_failures(host, mresult[0].result):
+            failed.add(host)
+    return failed
+
+
+def _watch(init_nornir, args):
+    """
+    Run all checks, then wait for changes to the inventory or host_vars
+    files. When host_vars change, only new or modified checks on the
+    affected hosts are re-executed, except on hosts whose last run failed
+    or was invalid, which re-execute all checks. When the inventory
+    changes, Nornir is re-initialized and all checks are re-executed. The
+    Nornir object lives across runs so netmiko sessions stay open.
+    """
+    # pylint: disable=import-outside-toplevel
+    from narc.watcher import Watcher
+
+    watcher = Watcher()
+    nornir = _with_processors(init_nornir)
+    failed = _run(nornir, args)
+    try:
+        while True:
+            inventory, only = watcher.wait()
+            if inventory:
+                print("inventory changed: re-running all checks")
+                nornir.close_connections(on_good=True, on_failed=True)
+                nornir = _with_processors(_init_nornir(args))
+                failed = _run(nornir, args)
+            elif only:
+                # None of the checks ran on hosts that failed or were invalid
+                # last time, so their outputs need every check, not just the
+                # changed ones
+                print(f"vars changed: re-running checks on {', '.join(only)}")
+                only.update({host: None for host in failed & only.keys()})
+                hosts = nornir.filter(filter_func=lambda h, ids=only: h.name in ids)
+                failed = (failed - only.keys()) | _run(hosts, args, only)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        nornir.close_connections(on_good=True, on_failed=True)
+
+
+def _validate_only(use_cache):
+    """
+    Load and validate the checks from every file in the 'host_vars/'
+    directory in parallel, without initializing Nornir. Optionally skip
+    files that are unchanged since the last cached preflight. Returns True
+    if at least one check is invalid.
+    """
+    # pylint: disable=import-outside-toplevel
+    from narc.preflight import preflight
+
+    cache = "bundles/preflight.json" if use_cache else None
+    failed = False
+    for host, fail_checks in preflight(cache=cache).items():
+        failed |= _print_failures(host, fail_checks)
+    return failed
+
+
+def _compile():
+    """
+    Compile the checks from every file in the 'host_vars/' directory into
+    bundles, skipping bundles that are already up to date, without
+    initializing Nornir. Files that cannot be loaded are reported as one
+    failure. Returns True if at least one check is invalid.
+    """
+    # pylint: disable=import-outside-toplevel
+    from narc.bundle import load_bundle
+    from narc.helpers import list_vars_hosts, validate_checks
+
+    failed = False
+    for host in list_vars_hosts():
+        file_base = f"host_vars/{host}"
+        try:
+            data = load_bundle(file_base)
+            if data["cmds"] is not None:
+                continue
+            fail_checks = validate_checks(data["checks"])
+        except Exception as exc:  # pylint: disable=broad-except
+            reason = f"cannot load {file_base}: {type(exc).__name__}: {exc}"
+            fail_checks = [{"reason": reason}]
+        failed |= _print_failures(host, fail_checks)
+    return failed
+
+
+def _print_failures(host, fail_checks):
+    """
+    Print the invalid checks for a host, if any, using the format:
+      {host} {check id} -> {fail reason}
+    Returns True if at least one check is invalid.
+    """
+    if not fail_checks:
+        return False
+
+    print(f"{host} error: at least one check is invalid")
+    for chk in fail_checks:
+        name = chk.get("id", "no_id")
+        print(f"{host[:12]:<12} {name[:24]:<24} -> {chk['reason']}")
+    return True
+
+
+def _print_error(host, mresult):
+    """
+    Print the exception that failed a host (such as a missing vars file),
+    taken from the innermost failed (sub)task, as one line in the same
+    format as "_print_failures". See nornir.log for the traceback.
+    """
+    exc = next(res.exception for res in reversed(mresult) if res.exception)
+    print(f"{host} error: run failed")
+    print(f"{host[:12]:<12} {'no_id':<24} -> {type(exc).__name__}: {exc}")
+
+
 def _process_args():
     """
     Process command line arguments according to README.
@@ -61,6 +276,88 @@ def _process_args():
         help="log timestamped status messages during runtime",
         action="store_true",
     )
+    parser.add_argument(
+        "-m",
+        "--lowmem",
+        help="release each raw check output as soon as it is processed",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-r",
+        "--retries",
+        help="times to retry a failed or truncated check (default: 2)",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "-B",
+        "--backoff",
+        help="seconds before the first retry, doubling after (default: 1)",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "-b",
+        "--bundle",
+        help="load checks from compiled bundles, recompiling stale ones",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c",
+        "--compile",
+        help="compile host_vars into bundles offline, then exit",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-V",
+        "--validate-only",
+        help="validate host_vars offline without running any checks",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-p",
+        "--preflight",
+        help="like --validate-only, but skip host_vars unchanged since last time",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        help="re-run changed checks whenever inventory or host_vars change",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-S",
+        "--sessions",
+        help="schedule checks across hosts using this many sessions in total",
+        type=int,
+    )
+    parser.add_argument(
+        "-M",
+        "--max-sessions",
+        help="with --sessions, max concurrent sessions per host (default: 1)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-P",
+        "--profile",
+        help="profile each stage, writing cProfile/tracemalloc data to outputs/",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-D",
+        "--daemon",
+        help="run as a daemon answering check requests on this Unix socket",
+        metavar="SOCKET",
+    )
+    parser.add_argument(
+        "-k",
+        "--keepalive",
+        help="seconds between daemon session keepalives (default: 60)",
+        type=int,
+        default=60,
+    )
     return parser.parse_args()
 
 
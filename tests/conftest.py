@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define test helpers shared across the unit tests.
+"""
+
+
+class FakeHost(dict):
+    """
+    Minimal stand-in for a Nornir host: a name plus dictionary-style data.
+    """
+
+    def __init__(self, name, **data):
+        super().__init__(**data)
+        self.name = name
+
+
+class FakeMultiResult(list):
+    """
+    Minimal stand-in for a Nornir MultiResult: the task result followed
+    by each subtask result, plus whether the task raised an exception.
+    """
+
+    failed = False
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the compiled check bundles.
+"""
+
+import json
+import os
+import narc.bundle as b
+
+
+def _write_vars(tmp_path, checks):
+    """
+    Write the checks to a JSON vars file and return its file base.
+    """
+    with open(tmp_path / "host.json", "w") as handle:
+        json.dump({"checks": checks}, handle)
+    return str(tmp_path / "host")
+
+
+def test_bundle_compile_and_reuse(tmp_path):
+    """
+    Test that a bundle is compiled with normalized checks and pre-rendered
+    commands, reused while current, and recompiled when the source changes.
+    """
+    chk = {
+        "id": "test",
+        "in_intf": "inside",
+        "proto": "tcp",
+        "src_ip": "192.0.2.1",
+        "src_port": "5001",
+        "dst_ip": "192.0.2.2",
+        "dst_port": 5002,
+        "should": "ALLOW",
+    }
+    file_base = _write_vars(tmp_path, [chk])
+    bundle_dir = tmp_path / "bundles"
+    data = b.load_bundle(file_base, bundle_dir)
+    assert data["checks"][0]["src_port"] == 5001
+    assert data["checks"][0]["should"] == "allow"
+    assert data["cmds"] == [
+        "packet-tracer input inside tcp 192.0.2.1 5001 192.0.2.2 5002 xml"
+    ]
+
+    # Unchanged source: the bundle is read back and not rewritten
+    bundle = bundle_dir / "host.bin"
+    mtime = os.stat(bundle).st_mtime_ns
+    assert b.load_bundle(file_base, bundle_dir) == data
+    assert os.stat(bundle).st_mtime_ns == mtime
+
+    # Changed source: the bundle is recompiled
+    chk["dst_port"] = 5003
+    _write_vars(tmp_path, [chk])
+    assert b.load_bundle(file_base, bundle_dir)["cmds"][0].endswith("5003 xml")
+
+
+def test_bundle_invalid(tmp_path):
+    """
+    Test that invalid checks are returned without commands or a bundle.
+    """
+    file_base = _write_vars(tmp_path, [{"id": "test"}])
+    data = b.load_bundle(file_base, tmp_path / "bundles")
+    assert data["cmds"] is None
+    assert data["checks"][0]["reason"] == "'in_intf' key missing or false-y"
+    assert not os.path.exists(tmp_path / "bundles" / "host.bin")
+
+
+def test_bundle_recompile(tmp_path, monkeypatch):
+    """
+    Test that an empty, truncated, or outdated (code changed) bundle
+    is recompiled rather than used or raising an error.
+    """
+    chk = {
+        "id": "test",
+        "in_intf": "inside",
+        "proto": 115,
+        "src_ip": "192.0.2.1",
+        "dst_ip": "192.0.2.2",
+        "should": "drop",
+    }
+    file_base = _write_vars(tmp_path, [chk])
+    bundle_dir = tmp_path / "bundles"
+    data = b.load_bundle(file_base, bundle_dir)
+    bundle = bundle_dir / "host.bin"
+    good = bundle.read_bytes()
+
+    for corrupt in [b"", good[:-5]]:
+        bundle.write_bytes(corrupt)
+        assert b.load_bundle(file_base, bundle_dir) == data
+        assert bundle.read_bytes() == good
+
+    monkeypatch.setattr(b, "_code_digest", lambda: bytes(32))
+    assert b.load_bundle(file_base, bundle_dir) == data
+    assert bundle.read_bytes() != good
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the multi-context ASA helper functions.
+"""
+
+import pytest
+from narc.helpers import changeto, group_by_context
+from narc.tasks import _select_checks
+
+
+class FakeConn:
+    """
+    Records the commands sent over a netmiko session.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self.cmds = []
+        self.narc_context = None
+
+    def send_command(self, cmd):
+        """
+        Record the command, rejecting unknown contexts like the ASA does.
+        """
+        self.cmds.append(cmd)
+        if cmd.endswith("bogus"):
+            return "ERROR: Context 'bogus' does not exist\n"
+        return ""
+
+
+def test_group_by_context():
+    """
+    Test that checks are grouped by context, keeping the original order
+    within each group and running checks without a context first.
+    """
+    checks = [
+        {"id": "a1", "context": "a"},
+        {"id": "x1"},
+        {"id": "b1", "context": "b"},
+        {"id": "a2", "context": "a"},
+        {"id": "x2"},
+    ]
+    order = [checks[i]["id"] for i in group_by_context(checks)]
+    assert order == ["x1", "x2", "a1", "a2", "b1"]
+
+
+def test_changeto():
+    """
+    Test that "changeto context" is issued only when the context changes,
+    and that returning to the login context uses the host data.
+    """
+    conn = FakeConn()
+    for context in [None, "a", "a", "b", None]:
+        changeto(conn, {"login_context": "admin2"}, context)
+    assert conn.cmds == [
+        "changeto context a",
+        "changeto context b",
+        "changeto context admin2",
+    ]
+
+    # A rejected context leaves the tracked context unchanged
+    with pytest.raises(ValueError):
+        changeto(conn, {}, "bogus")
+    assert conn.narc_context is None
+
+
+def test_select_checks():
+    """
+    Test that the selected checks are grouped by context along with their
+    commands, keeping only the requested check IDs (watch mode).
+    """
+    checks = [{"id": "a1", "context": "a"}, {"id": "x1"}, {"id": "x2"}]
+    cmds = ["cmd a1", "cmd x1", "cmd x2"]
+    assert _select_checks(checks, cmds) == (
+        [checks[1], checks[2], checks[0]],
+        ["cmd x1", "cmd x2", "cmd a1"],
+    )
+    assert _select_checks(checks, cmds, {"a1", "x2"}) == (
+        [checks[2], checks[0]],
+        ["cmd x2", "cmd a1"],
+    )
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the daemon's request handling, using a
+fake Nornir object that runs the real tasks in the calling thread.
+"""
+
+import json
+import socket
+import threading
+from argparse import Namespace
+from types import SimpleNamespace
+import pytest
+from conftest import FakeHost, FakeMultiResult
+from narc.daemon import CheckServer
+
+
+class FakeTask:
+    """
+    Minimal stand-in for a Nornir task that runs subtasks immediately.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, host, nornir, results):
+        self.host = host
+        self.nornir = nornir
+        self.results = results
+
+    def run(self, task, **kwargs):
+        """
+        Run a subtask for the same host and record its result.
+        """
+        sub = FakeTask(self.host, self.nornir, self.results)
+        self.results.append(SimpleNamespace(result=task(sub, **kwargs)))
+
+
+class FakeNornir:
+    """
+    Minimal stand-in for a Nornir object that runs tasks serially.
+    """
+
+    def __init__(self, hosts):
+        self.inventory = SimpleNamespace(hosts={host.name: host for host in hosts})
+        self.config = None
+        self.runs = 0
+
+    def filter(self, name):
+        """
+        Returns a new fake Nornir object containing only the named host.
+        """
+        return FakeNornir([self.inventory.hosts[name]])
+
+    def run(self, task, on_failed, **kwargs):
+        """
+        Run the task for every host and return a dictionary of results.
+        """
+        # pylint: disable=unused-argument
+        self.runs += 1
+        aresult = {}
+        for name, host in self.inventory.hosts.items():
+            mresult = aresult[name] = FakeMultiResult([None])
+            try:
+                mresult[0] = SimpleNamespace(
+                    result=task(FakeTask(host, self, mresult), **kwargs)
+                )
+            except Exception:  # pylint: disable=broad-except
+                mresult.failed = True
+        return aresult
+
+
+class FakeSessionHost(FakeHost):
+    """
+    A host that records whether its lock was held while connecting.
+    """
+
+    def __init__(self, name, locks):
+        super().__init__(name)
+        self.connections = {}
+        self.locks = locks
+        self.locked = None
+
+    def get_connection(self, connection, configuration):
+        """
+        Record the state of the host's lock instead of connecting.
+        """
+        # pylint: disable=unused-argument
+        self.locked = self.locks[self.name].locked()
+
+
+class FakeDownHost(FakeHost):
+    """
+    A host that refuses its first login, leaving the unopened connection
+    plugin behind like Nornir does, then accepts later logins.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.connections = {}
+        self.logins = 0
+
+    def get_connection(self, connection, configuration):
+        """
+        Returns the open session, opening a new one if there is none.
+        """
+        # pylint: disable=unused-argument
+        if connection not in self.connections:
+            self.logins += 1
+            self.connections[connection] = SimpleNamespace()
+            if self.logins == 1:
+                raise ConnectionRefusedError("host down")
+            alive = SimpleNamespace(is_alive=lambda: True)
+            self.connections[connection].connection = alive
+        return self.connections[connection].connection
+
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    Test fixture setup to create a dryrun daemon bound to a temporary socket.
+    """
+    args = Namespace(
+        daemon=str(tmp_path / "narc.sock"), dryrun=True, status=False, keepalive=60
+    )
+    nornir = FakeNornir([FakeHost("ASAV1")])
+    server = CheckServer(nornir, args)
+    yield server
+    server.server_close()
+
+
+def _check(**kwargs):
+    """
+    Returns a valid check dictionary, updated with any supplied keys.
+    """
+    chk = {
+        "host": "ASAV1",
+        "id": "DNS OUTBOUND",
+        "in_intf": "inside",
+        "proto": "udp",
+        "src_ip": "192.0.2.2",
+        "src_port": 5000,
+        "dst_ip": "8.8.8.8",
+        "dst_port": 53,
+        "should": "allow",
+    }
+    chk.update(kwargs)
+    return chk
+
+
+def test_check_success(server):
+    """
+    Test that a valid check returns the parsed result.
+    """
+    resp = server.check(_check())
+    assert resp["host"] == "ASAV1"
+    assert resp["action"] == "ALLOW"
+    assert resp["success"]
+    assert "reason" not in resp
+
+
+def test_check_bad_request(server):
+    """
+    Test that requests which are not objects or name an unknown host fail
+    without running any task.
+    """
+    assert server.check([1]) == {"reason": "request must be a JSON object"}
+    resp = server.check(_check(host="ASAV9"))
+    assert resp["reason"] == "'host' key missing or not in inventory"
+    resp = server.check(_check(host=None))
+    assert resp["reason"] == "'host' key missing or not in inventory"
+
+
+def test_handler(server):
+    """
+    Test that each request line over the socket gets one response line,
+    including requests that are not valid JSON.
+    """
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(server.args.daemon)
+            sock.sendall(b"{bad\n\n" + json.dumps(_check()).encode() + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("r") as handle:
+                resps = [json.loads(line) for line in handle]
+    finally:
+        server.shutdown()
+
+    assert len(resps) == 2
+    assert resps[0]["reason"].startswith("request is not valid JSON")
+    assert resps[1]["success"]
+
+
+def test_check_invalid(server):
+    """
+    Test that invalid checks return the first validation failure.
+    """
+    resp = server.check(_check(should="maybe"))
+    assert resp["reason"] == "'should' value must be allow|drop"
+
+    chk = _check()
+    del chk["id"]
+    resp = server.check(chk)
+    assert resp["reason"] == "'id' key missing or false-y"
+
+
+def test_keepalive(tmp_path):
+    """
+    Test that one Nornir run probes every host, each holding its own lock.
+    """
+    args = Namespace(daemon=str(tmp_path / "narc.sock"))
+    locks = {}
+    nornir = FakeNornir([FakeSessionHost(name, locks) for name in ["a", "b"]])
+    server = CheckServer(nornir, args)
+    locks.update(server.locks)
+    server.keepalive()
+    server.server_close()
+
+    assert nornir.runs == 1
+    assert all(host.locked for host in nornir.inventory.hosts.values())
+    assert not any(lock.locked() for lock in locks.values())
+
+
+def test_keepalive_reconnect(tmp_path):
+    """
+    Test that a host which cannot be reached during one probe is logged
+    into again on the next probe.
+    """
+    host = FakeDownHost("a")
+    nornir = FakeNornir([host])
+    server = CheckServer(nornir, Namespace(daemon=str(tmp_path / "narc.sock")))
+    server.keepalive()
+    assert "netmiko" not in host.connections
+    server.keepalive()
+    server.server_close()
+
+    assert host.logins == 2
+    assert host.connections["netmiko"].connection.is_alive()
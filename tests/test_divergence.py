@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the fleet-wide divergence analysis.
+"""
+
+import json
+import pytest
+from conftest import FakeHost
+from narc.divergence import digest, find_divergences
+from narc.divergence import normalize_flow, normalize_outcome
+from narc.processors import ProcDiff
+
+
+@pytest.fixture(scope="module")
+def results():
+    """
+    Test fixture setup to load the parsed results from the sample outputs.
+    """
+    with open("samples/result.json", "r") as handle:
+        return json.load(handle)
+
+
+def test_normalize_flow():
+    """
+    Test that flows are identical regardless of the check id and the
+    variations allowed in vars files, but distinguish "tcp" from "6".
+    """
+    chk = {
+        "id": "a",
+        "in_intf": "inside",
+        "proto": "TCP",
+        "src_ip": "fc00:0:0::1",
+        "src_port": "5000",
+        "dst_ip": "fc00::2",
+        "dst_port": 22,
+    }
+    same = dict(chk, id="b", proto="tcp", src_ip="fc00::1", src_port=5000)
+    assert digest(normalize_flow(chk)) == digest(normalize_flow(same))
+    assert normalize_flow(chk) != normalize_flow(dict(chk, proto=6))
+    assert normalize_flow(chk) != normalize_flow(dict(chk, context="tenant-a"))
+
+
+def test_normalize_outcome(results):
+    """
+    Test that the outcome includes only the ACCESS-LIST phase config.
+    """
+    outcome = normalize_outcome(results["ASAV1"]["DNS OUTBOUND"])
+    assert outcome["action"] == "allow"
+    assert outcome["drop_reason"] is None
+    assert outcome["acl"] == [
+        "Implicit Rule",
+        "access-group ACL_INSIDE in interface inside\n"
+        "access-list ACL_INSIDE extended permit udp any any",
+    ]
+
+
+def test_find_divergences():
+    """
+    Test that only flows with several outcomes within a role are reported.
+    """
+    entries = [
+        ("edge", "f1", "allow", "asa1", "a"),
+        ("edge", "f1", "allow", "asa2", "a"),
+        ("edge", "f2", "allow", "asa1", "b"),
+        ("edge", "f2", "drop", "asa2", "c"),
+        ("core", "f2", "drop", "asa3", "b"),
+    ]
+    assert find_divergences(entries) == [
+        ("edge", "f2", {"allow": [("asa1", "b")], "drop": [("asa2", "c")]})
+    ]
+
+
+def test_proc_diff(results, tmp_path, monkeypatch):
+    """
+    Test that the processor reports the same flow with different verdicts
+    on two hosts, and ignores checks that could not be completed.
+    """
+    chk = {
+        "id": "DNS",
+        "in_intf": "inside",
+        "proto": "udp",
+        "src_ip": "192.0.2.2",
+        "src_port": 5000,
+        "dst_ip": "8.8.8.8",
+        "dst_port": 53,
+    }
+    error = {"result": {"action": "ERROR", "drop-reason": "OSError: timed out"}}
+    proc = ProcDiff()
+    for name, data in [
+        ("ASAV1", results["ASAV1"]["DNS OUTBOUND"]),
+        ("ASAV2", results["ASAV1"]["SSH INBOUND"]),
+        ("ASAV3", error),
+    ]:
+        proc.rows[name] = {"DNS": proc.format_check(FakeHost(name), chk, data, True)}
+
+    monkeypatch.chdir(tmp_path)
+    proc.task_completed(None, None)
+    with open("outputs/divergence.json", "r") as handle:
+        report = json.load(handle)
+
+    assert len(report) == 1
+    assert report[0]["flow"] == normalize_flow(chk)
+    outcomes = report[0]["outcomes"]
+    assert [out["action"] for out in outcomes] == ["allow", "drop"]
+    assert [out["checks"] for out in outcomes] == [
+        [{"host": "ASAV1", "id": "DNS"}],
+        [{"host": "ASAV2", "id": "DNS"}],
+    ]
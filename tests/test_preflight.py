@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the parallel, cached host_vars preflight.
+"""
+
+import shutil
+import pytest
+from narc import preflight as p
+
+
+@pytest.fixture
+def vars_dir(tmp_path):
+    """
+    Test fixture setup to create a host_vars directory with valid hosts,
+    an unparsable file, and a file containing an invalid check.
+    """
+    for i in range(3):
+        shutil.copy("host_vars/ASAV1.yaml", tmp_path / f"good{i}.yaml")
+    (tmp_path / "broken.json").write_text("{bad")
+    (tmp_path / "invalid.yaml").write_text(
+        "checks:\n  - id: x\n    in_intf: inside\n    should: maybe\n"
+    )
+    return tmp_path
+
+
+def _assert_failures(fails):
+    """
+    Ensure only the broken and invalid files are reported, as expected.
+    """
+    assert list(fails) == ["broken", "invalid"]
+    assert fails["broken"][0]["reason"].startswith("cannot load")
+    assert fails["invalid"] == [
+        {"id": "x", "reason": "'should' value must be allow|drop"}
+    ]
+
+
+def test_parallel(vars_dir, monkeypatch):
+    """
+    Test that the process pool reports the same failures.
+    """
+    monkeypatch.setattr(p, "MIN_PARALLEL", 0)
+    _assert_failures(p.preflight(vars_dir, cache=None, workers=2))
+
+
+def test_cache(vars_dir, monkeypatch):
+    """
+    Test that unchanged files are not checked again, while changed
+    files are, using the cached results.
+    """
+    cache = vars_dir / "cache" / "preflight.json"
+    _assert_failures(p.preflight(vars_dir, cache=str(cache)))
+
+    checked = []
+    real_check_file = p.check_file
+
+    def _check_file(src, text):
+        checked.append(src)
+        return real_check_file(src, text)
+
+    monkeypatch.setattr(p, "check_file", _check_file)
+    _assert_failures(p.preflight(vars_dir, cache=str(cache)))
+    assert not checked
+
+    # Fixing the invalid file clears its failures on the next preflight
+    shutil.copy("host_vars/ASAV1.yaml", vars_dir / "invalid.yaml")
+    assert list(p.preflight(vars_dir, cache=str(cache))) == ["broken"]
+    assert checked == [str(vars_dir / "invalid.yaml")]
+
+
+def test_malformed(tmp_path):
+    """
+    Test that files whose "checks" are missing or not a list of
+    dictionaries are each reported as one failure, rather than crashing.
+    """
+    (tmp_path / "empty.yaml").write_text("checks:\n")
+    (tmp_path / "ints.json").write_text('{"checks": [1]}')
+    (tmp_path / "nolist.json").write_text('{"checks": {"id": "x"}}')
+    fails = p.preflight(tmp_path, cache=None)
+    assert list(fails) == ["empty", "ints", "nolist"]
+    for fail in fails.values():
+        assert len(fail) == 1
+        assert "'checks' must be a list of dictionaries" in fail[0]["reason"]
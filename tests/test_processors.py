@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the processors, which spool each result
+to disk as soon as its check completes.
+"""
+
+import json
+import threading
+from argparse import Namespace
+from types import SimpleNamespace
+import pytest
+from conftest import FakeHost, FakeMultiResult
+from narc.processors import ProcTerse, ProcCSV, ProcJSON
+
+XML = "<result><action>{}</action></result>"
+
+
+def _check(chk_id, should):
+    """
+    Returns a valid rawip check dictionary with the supplied id and intent.
+    """
+    return {
+        "id": chk_id,
+        "in_intf": "inside",
+        "proto": 115,
+        "src_ip": "192.0.2.1",
+        "dst_ip": "192.0.2.2",
+        "should": should,
+    }
+
+
+def _run(procs, host, checks, actions, failonly=False):
+    """
+    Feed the results of one run for a host through the processor hooks,
+    completing the checks in the order of "actions" (check id -> action).
+    """
+    parent = SimpleNamespace(params={"args": Namespace(failonly=failonly)})
+    by_id = {chk["id"]: chk for chk in checks}
+    for proc in procs:
+        for chk_id, action in actions.items():
+            task = SimpleNamespace(params={"chk": by_id[chk_id]}, parent_task=parent)
+            result = SimpleNamespace(result=XML.format(action), retries=0)
+            proc.subtask_instance_completed(task, host, FakeMultiResult([result]))
+
+        loaded = FakeMultiResult(
+            [None, SimpleNamespace(result={"checks": checks}, failed=False)]
+        )
+        proc.task_instance_completed(None, host, loaded)
+        proc.task_completed(None, None)
+
+
+@pytest.fixture
+def procs(tmp_path, monkeypatch):
+    """
+    Test fixture setup to create each processor, writing to a temporary
+    outputs/ directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    return [ProcTerse(), ProcCSV(), ProcJSON()]
+
+
+def test_outputs(procs):
+    """
+    Test that results completed out of order are written in check order,
+    and that only the locations of the spooled results stay in memory.
+    """
+    checks = [_check("one", "allow"), _check("two", "drop")]
+    _run(procs, FakeHost("asa1"), checks, {"two": "DROP", "one": "DROP"})
+    _run(procs, FakeHost("asa2"), checks, {"one": "ALLOW", "two": "DROP"})
+
+    with open("outputs/result.txt", "r") as handle:
+        assert handle.read() == (
+            "asa1         one                      -> FAIL\n"
+            "asa1         two                      -> PASS\n"
+            "asa2         one                      -> PASS\n"
+            "asa2         two                      -> PASS\n"
+        )
+
+    with open("outputs/result.csv", "r") as handle:
+        lines = handle.read().splitlines()
+    assert [line.split(",")[1] for line in lines[1:]] == ["one", "two"] * 2
+
+    with open("outputs/result.json", "r") as handle:
+        text = handle.read()
+    data = json.loads(text)
+    assert text == json.dumps(data, indent=2)
+    assert data["asa1"]["one"] == {"result": {"action": "DROP"}, "retries": 0}
+
+    for proc in procs:
+        for rows in proc.rows.values():
+            assert all(isinstance(loc, tuple) for loc in rows.values())
+
+
+def test_rerun(procs):
+    """
+    Test that re-running some checks (watch mode) replaces only their
+    results, and that "failonly" removes results that now pass.
+    """
+    checks = [_check("one", "allow"), _check("two", "drop")]
+    host = FakeHost("asa1")
+    _run(procs, host, checks, {"one": "DROP", "two": "ALLOW"})
+    _run(procs, host, checks, {"two": "DROP"}, failonly=True)
+
+    with open("outputs/result.txt", "r") as handle:
+        assert handle.read() == "asa1         one                      -> FAIL\n"
+    with open("outputs/result.json", "r") as handle:
+        assert list(json.load(handle)["asa1"]) == ["one"]
+
+    _run(procs, host, checks, {"one": "ALLOW"})
+    with open("outputs/result.json", "r") as handle:
+        assert json.load(handle) == {
+            "asa1": {"one": {"result": {"action": "ALLOW"}, "retries": 0}}
+        }
+
+
+def test_concurrent_hosts(procs):
+    """
+    Test that hosts completing checks on concurrent threads (like Nornir
+    does) all have their results written, none lost to another host.
+    """
+    checks = [_check("one", "allow"), _check("two", "drop")]
+    hosts = [FakeHost(f"asa{i}") for i in range(8)]
+    barrier = threading.Barrier(len(hosts))
+    parent = SimpleNamespace(params={"args": Namespace(failonly=False)})
+
+    def _host_run(host):
+        barrier.wait()
+        for proc in procs:
+            for chk in checks:
+                task = SimpleNamespace(params={"chk": chk}, parent_task=parent)
+                result = SimpleNamespace(result=XML.format("DROP"), retries=0)
+                proc.subtask_instance_completed(
+                    task, host, FakeMultiResult([result])
+                )
+            loaded = FakeMultiResult(
+                [None, SimpleNamespace(result={"checks": checks}, failed=False)]
+            )
+            proc.task_instance_completed(None, host, loaded)
+
+    threads = [threading.Thread(target=_host_run, args=(host,)) for host in hosts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for proc in procs:
+        proc.task_completed(None, None)
+
+    with open("outputs/result.txt", "r") as handle:
+        assert len(handle.read().splitlines()) == 2 * len(hosts)
+    with open("outputs/result.json", "r") as handle:
+        assert sorted(json.load(handle)) == sorted(host.name for host in hosts)
+
+
+def test_failed_host(procs):
+    """
+    Test that a host which fails before its checks are loaded keeps the
+    results from its previous run (watch mode).
+    """
+    checks = [_check("one", "allow")]
+    host = FakeHost("asa1")
+    _run(procs, host, checks, {"one": "ALLOW"})
+    failed = FakeMultiResult([SimpleNamespace(result="Traceback", failed=True)])
+    for proc in procs:
+        proc.task_instance_completed(None, host, failed)
+        proc.task_completed(None, None)
+
+    with open("outputs/result.txt", "r") as handle:
+        assert handle.read() == "asa1         one                      -> PASS\n"
+
+
+def test_terse_context(procs):
+    """
+    Test that the terse format adds the context as a last column, keeping
+    the id and status columns aligned with rows that have no context.
+    """
+    checks = [_check("one", "allow"), {**_check("two", "allow"), "context": "ctx_a"}]
+    _run(
+        procs,
+        FakeHost("asa1_long_hostname"),
+        checks,
+        {"one": "ALLOW", "two": "DROP"},
+    )
+
+    with open("outputs/result.txt", "r") as handle:
+        assert handle.read() == (
+            "asa1_long_ho one                      -> PASS\n"
+            "asa1_long_ho two                      -> FAIL ctx_a\n"
+        )
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the per-stage profiling hooks.
+"""
+
+import os
+import tracemalloc
+from narc import profiler
+
+
+def test_disabled_stage():
+    """
+    Test that stages are no-ops, sharing one context manager, by default.
+    """
+    assert not profiler.ENABLED
+    assert profiler.stage("a") is profiler.stage("b") is profiler.NULL_STAGE
+
+
+def test_enabled_stages(tmp_path, monkeypatch):
+    """
+    Test that nested stages are recorded separately and dumped to disk.
+    """
+    monkeypatch.setattr(profiler, "PROFILES", {})
+    monkeypatch.setattr(profiler, "STATS", {})
+    monkeypatch.setattr(profiler, "ENABLED", False)
+    profiler.enable()
+    for _ in range(2):
+        with profiler.stage("outer"):
+            with profiler.stage("inner"):
+                sum(range(1000))
+
+    assert profiler.STATS["outer"][0] == profiler.STATS["inner"][0] == 2
+    assert not profiler.STACK
+    profiler.dump(tmp_path)
+    tracemalloc.stop()
+    assert sorted(os.listdir(tmp_path)) == [
+        "profile_inner.prof",
+        "profile_outer.prof",
+        "profile_summary.txt",
+    ]
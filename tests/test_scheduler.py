@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the fleet-wide check scheduler.
+"""
+
+import threading
+import time
+from conftest import FakeHost
+from narc.scheduler import HostDown, Scheduler
+
+
+class FakeSession:
+    """
+    Records the number of concurrent sessions per host and per network.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    lock = threading.Lock()
+    current = {}
+    peak = {}
+
+    def __init__(self, host):
+        self.keys = [host.name, host.get("mgmt_net")]
+        with self.lock:
+            for key in self.keys:
+                self.current[key] = self.current.get(key, 0) + 1
+                self.peak[key] = max(self.peak.get(key, 0), self.current[key])
+
+    def disconnect(self):
+        """
+        Close the session, decrementing the concurrent session counts.
+        """
+        with self.lock:
+            for key in self.keys:
+                self.current[key] -= 1
+
+
+def _execute(session, host, chk):
+    """
+    Simulate a short-running check and return a unique output string.
+    """
+    # pylint: disable=unused-argument
+    time.sleep(0.001)
+    return f"{host.name}:{chk['id']}"
+
+
+def _run(hosts, budget, **kwargs):
+    """
+    Schedule 'count' checks for each (host, count) pair and return the
+    outputs for each host in submission order.
+    """
+    FakeSession.current.clear()
+    FakeSession.peak.clear()
+    sched = Scheduler(budget, connect=FakeSession, execute=_execute, **kwargs)
+    futures = {
+        host.name: [sched.submit(host, {"id": i}) for i in range(count)]
+        for host, count in hosts
+    }
+    sched.close()
+    return {name: [f.result()[0] for f in futs] for name, futs in futures.items()}
+
+
+def test_results_in_order():
+    """
+    Test that every check resolves to its own output, in order.
+    """
+    hosts = [(FakeHost("big", max_sessions=3), 200), (FakeHost("small"), 5)]
+    results = _run(hosts, budget=4)
+    for host, count in hosts:
+        assert results[host.name] == [f"{host.name}:{i}" for i in range(count)]
+
+
+def test_session_limits():
+    """
+    Test that per-host and per-network session limits are respected while
+    idle capacity is used to open extra sessions to the busiest host.
+    """
+    net = {"mgmt_net": "oob", "mgmt_net_budget": 3}
+    hosts = [
+        (FakeHost("big", max_sessions=2, **net), 300),
+        (FakeHost("mid", max_sessions=2, **net), 100),
+        (FakeHost("other", max_sessions=4), 100),
+    ]
+    _run(hosts, budget=8)
+    assert FakeSession.peak["big"] == 2
+    assert FakeSession.peak["mid"] <= 2
+    assert FakeSession.peak["oob"] == 3
+    assert FakeSession.peak["other"] <= 4
+    assert all(count == 0 for count in FakeSession.current.values())
+
+
+def test_default_max_sessions():
+    """
+    Test that hosts without "max_sessions" data use the scheduler default,
+    so a single busy host can use several sessions.
+    """
+    _run([(FakeHost("big"), 100), (FakeHost("capped", max_sessions=1), 100)], 8)
+    assert FakeSession.peak["big"] == 1
+    _run(
+        [(FakeHost("big"), 100), (FakeHost("capped", max_sessions=1), 100)],
+        8,
+        max_sessions=3,
+    )
+    assert FakeSession.peak["big"] == 3
+    assert FakeSession.peak["capped"] == 1
+
+
+def test_failed_check():
+    """
+    Test that a failing check is retried on a new session, and raises
+    only for that check's future once all retries are exhausted.
+    """
+    sessions = []
+
+    def connect(host):
+        sessions.append(FakeSession(host))
+        return sessions[-1]
+
+    def execute(session, host, chk):
+        if chk["id"] == 1 or (chk["id"] == 2 and len(sessions) < 4):
+            raise OSError("channel dropped")
+        return _execute(session, host, chk)
+
+    sched = Scheduler(1, connect=connect, execute=execute, retries=1)
+    futures = [sched.submit(FakeHost("host"), {"id": i}) for i in range(3)]
+    sched.close()
+    assert futures[0].result() == ("host:0", 0)
+    assert isinstance(futures[1].exception(), OSError)
+    assert futures[2].result() == ("host:2", 1)
+    assert len(sessions) == 4
+
+
+def test_unreachable_host(monkeypatch):
+    """
+    Test that a host whose session cannot be opened is only retried once
+    for all of its checks. The rest fail as never run (HostDown) without
+    another login, while other hosts are unaffected.
+    """
+    monkeypatch.setattr(time, "sleep", lambda secs: None)
+    logins = []
+
+    def connect(host):
+        logins.append(host.name)
+        if host.name == "down":
+            raise ConnectionError("host unreachable")
+        return FakeSession(host)
+
+    sched = Scheduler(2, connect=connect, execute=_execute, retries=2)
+    down = [sched.submit(FakeHost("down"), {"id": i}) for i in range(50)]
+    up = [sched.submit(FakeHost("up"), {"id": i}) for i in range(50)]
+    sched.close()
+    late = sched.submit(FakeHost("down"), {"id": 50})
+    assert isinstance(down[0].exception(), ConnectionError)
+    assert all(isinstance(f.exception(), HostDown) for f in down[1:] + [late])
+    assert str(late.exception()) == "ConnectionError: host unreachable"
+    assert [f.result()[0] for f in up] == [f"up:{i}" for i in range(50)]
+    assert logins.count("down") == 3
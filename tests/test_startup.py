@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define tests that track CLI cold-start time and ensure heavy
+imports remain deferred until they are needed.
+"""
+
+import os
+import subprocess  # nosec
+import sys
+import time
+
+# Upper bound in seconds for a complete "--validate-only" run, measured end
+# to end from launching a fresh interpreter until it exits. The default is
+# loose enough for a busy CI worker; set NARC_STARTUP_BUDGET to tighten it
+STARTUP_BUDGET = float(os.environ.get("NARC_STARTUP_BUDGET", "2.0"))
+
+# Modules that must not be loaded just by starting the CLI
+HEAVY_MODULES = ["nornir", "netmiko", "xmltodict", "netaddr", "yaml"]
+
+
+def _run_python(code):
+    """
+    Run the supplied code in a new Python interpreter (so that imports are
+    truly cold) and return the completed process.
+    """
+    # Runs the test interpreter with fixed arguments and no shell
+    return subprocess.run(  # nosec
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+
+def test_cold_start_time():
+    """
+    Test that a complete "--validate-only" run on the included host_vars,
+    including interpreter startup, is fast. The time is printed so it can
+    be tracked across runs (use "pytest -s" to see it).
+    """
+    cmd = [sys.executable, "runbook.py", "--validate-only"]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True)  # nosec
+    elapsed = time.perf_counter() - start
+    print(f"runbook --validate-only: {elapsed * 1000:.1f} ms")
+    assert elapsed < STARTUP_BUDGET
+
+
+def test_import():
+    """
+    Test that importing the runbook loads no heavy modules.
+    """
+    proc = _run_python(
+        "import sys\n"
+        "import runbook\n"
+        f"print(','.join(m for m in {HEAVY_MODULES} if m in sys.modules))\n"
+    )
+    assert not proc.stdout.strip()
+
+
+def test_validate_only():
+    """
+    Test that "--validate-only" succeeds on the included host_vars
+    without ever importing Nornir.
+    """
+    proc = _run_python(
+        "import sys\n"
+        "sys.argv = ['runbook.py', '--validate-only']\n"
+        "import runbook\n"
+        "runbook.main(runbook._process_args())\n"
+        "print('nornir' in sys.modules)\n"
+    )
+    assert proc.stdout.strip() == "False"
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for issuing checks over the host's own netmiko
+session, including retries and the ERROR output for failed checks.
+"""
+
+from argparse import Namespace
+from concurrent.futures import Future
+from types import SimpleNamespace
+import pytest
+from conftest import FakeHost, FakeMultiResult
+from narc import helpers
+from narc.processors import ProcCSV
+from narc.scheduler import HostDown
+from narc.tasks import _error_output, _packet_trace, _scheduled_trace, _send_check
+
+GOOD = "<result><action>ALLOW</action></result>"
+CHK = {
+    "id": "one",
+    "proto": 115,
+    "src_ip": "192.0.2.1",
+    "dst_ip": "192.0.2.2",
+    "should": "allow",
+}
+
+
+class FakeConn:
+    """
+    Minimal stand-in for a netmiko session that returns (or raises) each
+    of the supplied outputs in turn.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.narc_context = None
+
+    def send_command(self, cmd, **kwargs):
+        """
+        Returns the next output, raising it instead if it is an exception.
+        """
+        # pylint: disable=unused-argument
+        output = self.outputs.pop(0)
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+
+class FakeNetmikoHost(FakeHost):
+    """
+    A host that opens a new FakeConn for each session, or fails to open
+    one when it has no outputs left to hand out (unreachable).
+    """
+
+    def __init__(self, name, sessions):
+        super().__init__(name)
+        self.sessions = sessions
+        self.connections = {}
+        self.logins = 0
+
+    def get_connection(self, connection, configuration):
+        """
+        Returns the open session, opening a new one if there is none.
+        """
+        # pylint: disable=unused-argument
+        if connection not in self.connections:
+            self.logins += 1
+            self.connections[connection] = None
+            if not self.sessions:
+                raise ConnectionError("host unreachable")
+            conn = FakeConn(self.sessions.pop(0))
+            self.connections[connection] = SimpleNamespace(connection=conn)
+        return self.connections[connection].connection
+
+    def close_connection(self, connection):
+        """
+        Closes the open session.
+        """
+        del self.connections[connection]
+
+
+def _task(host, retries=2):
+    """
+    Returns a minimal stand-in for a Nornir subtask running on the host.
+    """
+    args = Namespace(retries=retries, backoff=1)
+    parent = SimpleNamespace(params={"args": args})
+    return SimpleNamespace(
+        host=host, nornir=SimpleNamespace(config=None), parent_task=parent
+    )
+
+
+@pytest.fixture(autouse=True)
+def sleeps(monkeypatch):
+    """
+    Test fixture setup to record each backoff rather than sleeping.
+    """
+    slept = []
+    monkeypatch.setattr(helpers.time, "sleep", slept.append)
+    return slept
+
+
+def test_retry(sleeps):
+    """
+    Test that failures are retried with exponential backoff, resetting
+    after each failure, and that the last exception is re-raised.
+    """
+    calls, resets = [], []
+
+    def _func():
+        calls.append(None)
+        if len(calls) < 3:
+            raise ValueError("flaky")
+        return "done"
+
+    assert helpers.retry(_func, 3, 0.5, lambda: resets.append(None)) == ("done", 2)
+    assert sleeps == [0.5, 1.0]
+    assert len(resets) == 2
+
+    sleeps.clear()
+    with pytest.raises(ValueError):
+        helpers.retry(_fail, 3, 1)
+    assert sleeps == [1, 2, 4]
+
+
+def _fail():
+    """
+    Always raises an exception, to exhaust every retry.
+    """
+    raise ValueError("down")
+
+
+def test_send_check_truncated():
+    """
+    Test that output without a closing </result> is rejected, so that the
+    session is not reused.
+    """
+    host = FakeHost("asa1")
+    assert _send_check(FakeConn([GOOD]), host, "cmd") == GOOD
+    with pytest.raises(ValueError, match="missing </result>"):
+        _send_check(FakeConn(["<result><action>ALL"]), host, "cmd")
+
+
+def test_error_output(tmp_path, monkeypatch):
+    """
+    Test that the ERROR output escapes the exception and produces an
+    ERROR row (a failed check) with the exception as the drop reason.
+    """
+    output = _error_output(ValueError("a<b"))
+    assert "ValueError: a&lt;b" in output
+
+    monkeypatch.chdir(tmp_path)
+    proc = ProcCSV()
+    task = SimpleNamespace(params={"chk": CHK}, parent_task=_task(None).parent_task)
+    task.parent_task.params["args"].failonly = False
+    result = SimpleNamespace(result=output, retries=2)
+    proc.subtask_instance_completed(
+        task, FakeHost("asa1"), FakeMultiResult([result])
+    )
+    loaded = [None, SimpleNamespace(result={"checks": [CHK]}, failed=False)]
+    proc.task_instance_completed(None, FakeHost("asa1"), loaded)
+    row = "".join(proc.read_rows("asa1"))
+    assert ",ERROR,ValueError: a<b,False,2,\n" in row
+
+
+def test_packet_trace_session(sleeps):
+    """
+    Test that checks reuse the host's session, and that a check whose
+    session drops is retried on a new session.
+    """
+    host = FakeNetmikoHost("asa1", [[GOOD, EOFError("dropped")], [GOOD]])
+    assert _packet_trace(_task(host), CHK, "cmd").retries == 0
+    result = _packet_trace(_task(host), CHK, "cmd")
+    assert (result.result, result.retries) == (GOOD, 1)
+    assert host.logins == 2
+    assert sleeps == [1]
+
+
+def test_packet_trace_error():
+    """
+    Test that a check failing on every session returns an ERROR output
+    rather than failing the host.
+    """
+    host = FakeNetmikoHost(
+        "asa1", [[ValueError("bad")] for _ in range(3)] + [[GOOD]]
+    )
+    result = _packet_trace(_task(host), CHK, "cmd")
+    assert "<action>ERROR</action>" in result.result
+    assert result.retries == 2
+    assert _packet_trace(_task(host), CHK, "cmd").result == GOOD
+
+
+def test_packet_trace_unreachable(sleeps):
+    """
+    Test that an unreachable host returns an ERROR output once its logins
+    are retried, without retrying the check itself, and that its remaining
+    checks return an ERROR output without another login.
+    """
+    host = FakeNetmikoHost("asa1", [])
+    result = _packet_trace(_task(host), CHK, "cmd")
+    assert "ConnectionError: host unreachable" in result.result
+    assert result.retries == 2
+    assert isinstance(result.down, HostDown)
+    assert host.logins == 3
+    assert sleeps == [1, 2]
+    assert "netmiko" not in host.connections
+
+    result = _packet_trace(_task(host), CHK, "cmd", down=result.down)
+    assert "HostDown: ConnectionError: host unreachable" in result.result
+    assert result.retries == 0
+    assert host.logins == 3
+
+
+def test_scheduled_trace_host_down():
+    """
+    Test that checks the scheduler could not run because their host is
+    down are reported as ERROR with 0 retries, while checks that failed
+    every attempt record all of the retries.
+    """
+    task = _task(FakeHost("asa1"))
+    for exc, retries in [(HostDown("ConnectionError: down"), 0), (OSError(), 2)]:
+        future = Future()
+        future.set_exception(exc)
+        result = _scheduled_trace(task, CHK, future)
+        assert "<action>ERROR</action>" in result.result
+        assert result.retries == retries
@@ -53,6 +53,13 @@ def test_validate_id(checks):
     _general_test(checks["id"], h.validate_id)
 
 
+def test_validate_context(checks):
+    """
+    Test the "validate_context" function.
+    """
+    _general_test(checks["context"], h.validate_context)
+
+
 def test_validate_in_intf(checks):
     """
     Test the "validate_in_intf" function.
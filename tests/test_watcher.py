@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+Author: Nick Russo
+Purpose: Define unit tests for the watch mode change detection.
+"""
+
+import json
+import pytest
+from narc.watcher import Watcher, diff_checks
+
+
+@pytest.fixture
+def old():
+    """
+    Test fixture setup to create a small 'checks' list
+    """
+    return [
+        {"id": "one", "proto": "tcp", "should": "allow"},
+        {"id": "two", "proto": "udp", "should": "drop"},
+    ]
+
+
+def test_diff_checks_unchanged(old):
+    """
+    Test that identical and reordered lists require no checks to run.
+    """
+    assert diff_checks(old, list(old)) == set()
+    assert diff_checks(old, list(reversed(old))) == set()
+
+
+def test_diff_checks_changed(old):
+    """
+    Test that only new and modified checks are returned, not deleted ones.
+    """
+    new = [
+        {"id": "two", "proto": "udp", "should": "allow"},
+        {"id": "three", "proto": "icmp", "should": "drop"},
+    ]
+    assert diff_checks(old, new) == {"two", "three"}
+
+
+def test_diff_checks_ambiguous(old):
+    """
+    Test that duplicate or missing IDs require all checks to run.
+    """
+    assert diff_checks(old, old + [{"id": "one"}]) is None
+    assert diff_checks(old, old + [{"proto": "tcp"}]) is None
+
+
+def test_watcher(tmp_path, monkeypatch):
+    """
+    Test that a modified vars file reports only its changed checks.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "host_vars").mkdir()
+    varfile = tmp_path / "host_vars" / "asa1.json"
+    varfile.write_text(json.dumps({"checks": [{"id": "one"}, {"id": "two"}]}))
+
+    watcher = Watcher(interval=0.01)
+    try:
+        varfile.write_text(json.dumps({"checks": [{"id": "one"}, {"id": "2"}]}))
+        assert watcher.wait() == (False, {"asa1": {"2"}})
+    finally:
+        watcher.close()